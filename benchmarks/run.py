@@ -0,0 +1,377 @@
+#!/usr/bin/env python
+# Benchmarks of the parsers and blocking methods on synthetic LAMMPS output
+#   Every case runs in its own process so its peak RSS is its own; results
+#   (wall / CPU time, rows/s, MB/s, peak RSS) are written to JSON and can be
+#   compared against a stored baseline to flag slowdowns.
+#
+#   python -m benchmarks.run --sizes 10000 100000 1000000 -o results.json
+#   python -m benchmarks.run --baseline results.json --tolerance 0.25
+
+# Standard Library
+import sys, os
+import time
+import json
+import platform
+import resource
+import tempfile
+import subprocess
+import argparse
+import multiprocessing
+from collections import OrderedDict
+
+# 3rd-Party Library
+import numpy as np
+
+import utils.parserIO as io
+import utils.blocking as blocking
+from   utils.welford  import Welford
+from   utils.profiling import peakRSS
+from   benchmarks     import synthetic
+
+#---------------------------------------------------------------------------------#
+#   Input files / arrays of a given size (rows of a log, atom lines of a dump,    #
+#   samples of a series), generated once per work directory                       #
+#---------------------------------------------------------------------------------#
+# With --compression the readers are timed on a gzip / bz2 / xz copy and the
+# MB/s are those of the compressed file
+def compressed( fileName, opts ):
+    if not opts.compression:
+        return fileName
+    compressedName = fileName + synthetic.compressedSuffix[opts.compression]
+    if not os.path.exists( compressedName ):
+        synthetic.compressFile( fileName, opts.compression )
+    return compressedName
+
+def logFile( workDir, size, opts ):
+    fileName = os.path.join( workDir, 'log.' + str(size) + '.lammps' )
+    if not os.path.exists( fileName ):
+        synthetic.writeLog( fileName, size // opts.chunks, opts.columns,
+                            opts.chunks, opts.warnings )
+    return compressed( fileName, opts )
+
+def dumpFile( workDir, size, opts ):
+    fileName = os.path.join( workDir, 'dump.' + str(size) + '.lammpstrj' )
+    if not os.path.exists( fileName ):
+        synthetic.writeDump( fileName, opts.frames, max( 1, size // opts.frames ) )
+    return compressed( fileName, opts )
+
+def xyzFile( workDir, size, opts ):
+    fileName = os.path.join( workDir, 'traj.' + str(size) + '.xyz' )
+    if not os.path.exists( fileName ):
+        synthetic.writeXYZ( fileName, opts.frames, max( 1, size // opts.frames ) )
+    return compressed( fileName, opts )
+
+def computeFile( workDir, size, opts ):
+    fileName = os.path.join( workDir, 'ave.' + str(size) + '.txt' )
+    if not os.path.exists( fileName ):
+        synthetic.writeCompute( fileName, size, opts.columns - 1 )
+    return compressed( fileName, opts )
+
+def series( size, opts ):
+    return synthetic.ar1( size )[:,0]
+
+#---------------------------------------------------------------------------------#
+#   Benchmark cases: setup (untimed) and return the timed call and what it        #
+#   processes (rows, bytes)                                                       #
+#---------------------------------------------------------------------------------#
+def caseLogData( workDir, size, opts ):
+    fileName = logFile( workDir, size, opts )
+    reader   = io.LAMMPSLog( 'LAMMPS_Log' )
+    run = lambda: reader.readData( fileName, None, io.allColumns )
+    return run, opts.chunks * (size // opts.chunks), os.path.getsize( fileName )
+
+def caseDumpData( workDir, size, opts ):
+    fileName = dumpFile( workDir, size, opts )
+    reader   = io.LAMMPSDump( 'LAMMPS_Dump' )
+    ycol     = OrderedDict( (key, float) for key in ('x', 'y', 'z') )
+    run = lambda: reader.readData( fileName, None, ycol )
+    return run, size, os.path.getsize( fileName )
+
+def caseDumpParallel( workDir, size, opts ):
+    fileName = dumpFile( workDir, size, opts )
+    reader   = io.LAMMPSDumpParallel( 'LAMMPS_DumpParallel' )
+    run = lambda: reader.readArray( fileName, ['x', 'y', 'z'] )
+    return run, size, os.path.getsize( fileName )
+
+def caseCompute( workDir, size, opts ):
+    fileName = computeFile( workDir, size, opts )
+    reader   = io.LAMMPSCompute( 'LAMMPS_compute' )
+    run = lambda: reader.readCompute( fileName )
+    return run, size, os.path.getsize( fileName )
+
+def caseXYZ( workDir, size, opts ):
+    fileName = xyzFile( workDir, size, opts )
+    reader   = io.XYZ( 'XYZ' )
+    run = lambda: reader.readTrajectory( fileName )
+    return run, size, os.path.getsize( fileName )
+
+def caseConvertData( workDir, size, opts ):
+    reader = io.LAMMPSLog( 'LAMMPS_Log' )
+    with io.openFile( logFile( workDir, size, opts ) ) as f:
+        header, rows = next( reader.thermoChunks( f ) )
+        rows = list( rows )
+    ycol = OrderedDict( (key, float) for key in header )
+    yID  = dict( (key, header.index(key)) for key in header )
+    run  = lambda: reader.convertData( rows, ycol=ycol, yID=yID )
+    return run, len(rows), sum( len(row) for row in rows )
+
+def caseScanBlocking( workDir, size, opts ):
+    data   = series( size, opts )
+    method = blocking.selectBlockMethod( "Flyvbjerg+Petersen" )
+    run = lambda: method.scanBlocking( data )
+    return run, size, data.nbytes
+
+def caseScanBlockingOnline( workDir, size, opts ):
+    data   = series( size, opts )
+    method = blocking.selectBlockMethod( "Online" )
+    run = lambda: method.scanBlocking( data )
+    return run, size, data.nbytes
+
+def caseBootstrap( workDir, size, opts ):
+    data   = series( size, opts )
+    method = blocking.selectBlockMethod( "Bootstrap", replicates=1000 )
+    run = lambda: method.scanBlocking( data )
+    return run, size, data.nbytes
+
+def caseJackknife( workDir, size, opts ):
+    data   = synthetic.ar1( size, 2 )
+    method = blocking.selectBlockMethod( "Jackknife",
+                                         estimator=lambda m: m[:,0] / ( 2.0 + m[:,1] ) )
+    run = lambda: method.scanBlocking( data )
+    return run, size, data.nbytes
+
+def caseWelford( workDir, size, opts ):
+    data = series( size, opts )
+    run = lambda: Welford( data )
+    return run, size, data.nbytes
+
+def caseWelfordScalar( workDir, size, opts ):
+    data = series( size, opts ).tolist()
+    run = lambda: Welford( data )
+    return run, size, 8 * size
+
+# Start up + one small analysis of block.log.py in a fresh interpreter (the
+# non-plotting path must not import matplotlib), size is ignored
+repoDir = os.path.dirname( os.path.dirname( os.path.abspath( __file__ ) ) )
+
+def caseColdStart( workDir, size, opts ):
+    fileName = logFile( workDir, 100 * opts.chunks, opts )
+    command  = [ sys.executable, os.path.join( repoDir, 'block.log.py' ),
+                 'log', fileName, 'Temp', '--no-cache' ]
+    devnull  = open( os.devnull, 'w' )
+    run = lambda: subprocess.check_call( command, stdout=devnull )
+    return run, 100 * opts.chunks, os.path.getsize( fileName )
+
+cases = OrderedDict( [
+    ( "LAMMPSLog.data",       caseLogData ),
+    ( "LAMMPSDump.data",      caseDumpData ),
+    ( "LAMMPSDumpParallel",   caseDumpParallel ),
+    ( "LAMMPSCompute",        caseCompute ),
+    ( "XYZ.readTrajectory",   caseXYZ ),
+    ( "convertData",          caseConvertData ),
+    ( "scanBlocking",         caseScanBlocking ),
+    ( "scanBlocking.online",  caseScanBlockingOnline ),
+    ( "bootstrap",            caseBootstrap ),
+    ( "jackknife",            caseJackknife ),
+    ( "Welford",              caseWelford ),
+    ( "Welford.scalar",       caseWelfordScalar ),
+    ( "coldStart",            caseColdStart ) ] )
+
+# Input file of the cases reading one, written before the timed process
+# starts so that generating it does not count in the peak RSS of the case
+caseInputs = {
+    "LAMMPSLog.data"     : logFile,
+    "LAMMPSDump.data"    : dumpFile,
+    "LAMMPSDumpParallel" : dumpFile,
+    "LAMMPSCompute"      : computeFile,
+    "XYZ.readTrajectory" : xyzFile,
+    "convertData"        : logFile,
+    "coldStart"          : lambda workDir, size, opts:
+                               logFile( workDir, 100 * opts.chunks, opts ) }
+
+#---------------------------------------------------------------------------------#
+#   Timing in a child process                                                     #
+#---------------------------------------------------------------------------------#
+# Resident set size right now in MB (the peak comes from utils.profiling)
+def currentRSS():
+    try:
+        with open( '/proc/self/statm', 'r' ) as f:
+            return int( f.read().split()[1] ) * resource.getpagesize() / 1024.**2
+    except IOError:
+        return None
+
+def timeCase( name, workDir, size, opts, queue ):
+    try:
+        startRSS = currentRSS()
+        run, rows, nbytes = cases[name]( workDir, size, opts )
+
+        wall, cpu = [], []
+        for i in range( opts.repeat ):
+            t0, c0 = time.time(), time.clock()
+            run()
+            wall.append( time.time() - t0 )
+            cpu.append( time.clock() - c0 )
+
+        best = min( wall )
+        queue.put( OrderedDict( [
+            ( "case",        name ),
+            ( "size",        size ),
+            ( "rows",        rows ),
+            ( "bytes",       nbytes ),
+            ( "wall_s",      best ),
+            ( "cpu_s",       min( cpu ) ),
+            ( "rows_per_s",  rows / best if best > 0 else None ),
+            ( "mb_per_s",    nbytes / 1024.**2 / best if best > 0 else None ),
+            ( "peak_rss_mb", peakRSS() ),
+            ( "start_rss_mb", startRSS ) ] ) )
+    except Exception as e:
+        queue.put( OrderedDict( [ ("case", name), ("size", size),
+                                  ("error", str(e) or repr(e)) ] ) )
+
+def prepareInput( name, workDir, size, opts ):
+    caseInputs[name]( workDir, size, opts )
+
+def runCase( name, workDir, size, opts ):
+    if name in caseInputs:
+        proc = multiprocessing.Process( target=prepareInput,
+                                        args=(name, workDir, size, opts) )
+        proc.start()
+        proc.join()
+
+    queue = multiprocessing.Queue()
+    proc  = multiprocessing.Process( target=timeCase,
+                                     args=(name, workDir, size, opts, queue) )
+    proc.start()
+    result = queue.get()
+    proc.join()
+    return result
+
+#---------------------------------------------------------------------------------#
+#   Regression comparison against a stored baseline                               #
+#---------------------------------------------------------------------------------#
+def caseKey( result ):
+    return result["case"] + "@" + str(result["size"])
+
+# Timing noise of very short cases is not flagged: a case is slower only
+# when beyond the tolerance *and* slower by more than minDelta seconds
+def compare( results, baseline, tolerance, minDelta=1e-3 ):
+    reference = dict( (caseKey(r), r) for r in baseline["results"]
+                      if not r.get("error") )
+    slower = []
+    print "\n{0: <32} {1: >10} {2: >10} {3: >7}".format(
+          "CASE@SIZE", "BASE (s)", "NOW (s)", "RATIO")
+    print "-" * 62
+    for result in results:
+        base = reference.get( caseKey(result) )
+        if result.get("error") or base is None:
+            continue
+        ratio = result["wall_s"] / base["wall_s"] if base["wall_s"] > 0 else 1.0
+        flag  = ""
+        if ratio > 1.0 + tolerance and \
+                result["wall_s"] - base["wall_s"] > minDelta:
+            flag = "  SLOWER"
+            slower.append( caseKey(result) )
+        print "{0: <32} {1: >10.4f} {2: >10.4f} {3: >7.2f}{4}".format(
+              caseKey(result), base["wall_s"], result["wall_s"], ratio, flag)
+    return slower
+
+def printResults( results ):
+    print "{0: <22} {1: >9} {2: >10} {3: >12} {4: >9} {5: >10}".format(
+          "CASE", "SIZE", "WALL (s)", "ROWS/s", "MB/s", "PEAK RSS")
+    print "-" * 77
+    for r in results:
+        if r.get("error"):
+            print "{0: <22} {1: >9} ERROR: {2}".format( r["case"], r["size"], r["error"] )
+            continue
+        print "{case: <22} {size: >9} {wall_s: >10.4f} {rows_per_s: >12.0f} " \
+              "{mb_per_s: >9.1f} {peak_rss_mb: >7.1f} MB".format( **r )
+
+#---------------------------------#
+#   Get Command line options      #
+#---------------------------------#
+def parseArgs( argv=None ):
+    parser = argparse.ArgumentParser(description="Benchmark the LAMMPS parsers \
+                                     and blocking methods on synthetic data.")
+    parser.add_argument( "--sizes", type=int, nargs="+", default=[10000, 100000],
+                         help="Rows / samples / dump atom lines per case" )
+    parser.add_argument( "--cases", type=str, nargs="+", default=list(cases),
+                         choices=list(cases), help="Cases to run (default: all)" )
+    parser.add_argument( "--columns", type=int, default=10,
+                         help="Thermo columns of the synthetic logs (incl. Step)" )
+    parser.add_argument( "--chunks", type=int, default=2,
+                         help="Run chunks of the synthetic logs" )
+    parser.add_argument( "--warnings", type=int, default=2,
+                         help="WARNING lines before every run of the logs" )
+    parser.add_argument( "--frames", type=int, default=10,
+                         help="Frames of the synthetic dumps" )
+    parser.add_argument( "--compression", default=None, choices=["gzip", "bz2", "xz"],
+                         help="Time the readers on compressed copies of the files" )
+    parser.add_argument( "--repeat", type=int, default=3,
+                         help="Timed repeats per case, the fastest is kept" )
+    parser.add_argument( "--work-dir", default=None, dest='workDir',
+                         help="Keep the generated files in this directory" )
+    parser.add_argument( "-o", "--output", default=None,
+                         help="Write the results to this JSON file" )
+    parser.add_argument( "--baseline", default=None,
+                         help="Compare against the results in this JSON file" )
+    parser.add_argument( "--tolerance", type=float, default=0.25,
+                         help="Flag cases slower than baseline by this fraction" )
+    parser.add_argument( "--cold-start-target", type=float, default=0.15, dest='coldStartTarget',
+                         help="Target wall time (s) of the coldStart case" )
+    parser.add_argument( "--min-delta", type=float, default=1e-3, dest='minDelta',
+                         help="Ignore slowdowns below this many seconds" )
+    return parser.parse_args( argv )
+
+def main( argv=None ):
+    opts = parseArgs( argv )
+    workDir = opts.workDir or tempfile.mkdtemp( prefix='lmps_bench_' )
+    if not os.path.isdir( workDir ):
+        os.makedirs( workDir )
+
+    results = []
+    for size in opts.sizes:
+        for name in opts.cases:
+            results.append( runCase( name, workDir, size, opts ) )
+
+    printResults( results )
+
+    status = 0
+    for result in results:
+        if result["case"] == "coldStart" and not result.get("error") and \
+                result["wall_s"] > opts.coldStartTarget:
+            print "\ncoldStart {0:.3f} s is above its target of {1:.3f} s".format(
+                  result["wall_s"], opts.coldStartTarget )
+            status = 1
+
+    if opts.output:
+        report = OrderedDict( [
+            ( "meta", OrderedDict( [
+                ( "date",     time.strftime('%Y-%m-%dT%H:%M:%S') ),
+                ( "python",   platform.python_version() ),
+                ( "numpy",    np.__version__ ),
+                ( "platform", platform.platform() ),
+                ( "columns",  opts.columns ),
+                ( "chunks",   opts.chunks ),
+                ( "frames",   opts.frames ),
+                ( "compression", opts.compression ),
+                ( "repeat",   opts.repeat ) ] ) ),
+            ( "results", results ) ] )
+        with open( opts.output, 'w' ) as f:
+            json.dump( report, f, indent=1 )
+
+    if not opts.workDir:
+        for name in os.listdir( workDir ):
+            os.remove( os.path.join( workDir, name ) )
+        os.rmdir( workDir )
+
+    if opts.baseline:
+        with open( opts.baseline, 'r' ) as f:
+            baseline = json.load( f )
+        slower = compare( results, baseline, opts.tolerance, opts.minDelta )
+        if slower:
+            print "\nSlowdowns beyond {0:.0%}: {1}".format( opts.tolerance, ', '.join(slower) )
+            return 1
+    return status
+
+if __name__ == "__main__":
+    sys.exit( main() )
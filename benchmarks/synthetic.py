@@ -0,0 +1,126 @@
+import math
+import gzip, bz2
+import shutil
+import subprocess
+import numpy as np
+
+#---------------------------------------------------------------------------------#
+#   Synthetic LAMMPS output for benchmarking the parsers and blocking methods     #
+#---------------------------------------------------------------------------------#
+
+thermoNames = [ 'Temp', 'PotEng', 'KinEng', 'TotEng', 'E_pair', 'E_mol',
+                'Press', 'Volume', 'Density', 'Lx', 'Ly', 'Lz', 'Pxx', 'Pyy',
+                'Pzz', 'Pxy', 'Pxz', 'Pyz', 'Enthalpy', 'Ecoul' ]
+
+# AR(1) series x[t] = phi x[t-1] + sqrt(1-phi^2) e[t] (unit variance,
+# statistical inefficiency (1+phi)/(1-phi)) for every column. Each chunk of
+# rows is the exact FFT convolution of the noise with phi^k plus the decay
+# of the last value of the previous chunk, so long series stay cheap.
+def ar1( n, ncols=1, phi=0.9, seed=0, chunk=2**16 ):
+    rng  = np.random.RandomState( seed )
+    data = np.empty( (n, ncols) )
+    last = np.zeros( ncols )
+    for start in range( 0, n, chunk ):
+        m    = min( chunk, n - start )
+        e    = rng.standard_normal( (m, ncols) ) * math.sqrt( 1.0 - phi*phi )
+        nfft = 2**int( math.ceil( math.log( 2*m, 2 ) ) )
+        kernel = phi ** np.arange( m )
+        conv = np.fft.irfft( np.fft.rfft( e, n=nfft, axis=0 ) *
+                             np.fft.rfft( kernel, n=nfft )[:,np.newaxis],
+                             n=nfft, axis=0 )[:m]
+        data[start:start+m] = conv + np.outer( phi ** np.arange(1, m+1), last )
+        last = data[start+m-1]
+    return data
+
+def thermoColumns( ncols ):
+    names = thermoNames[:ncols-1]
+    names += [ 'c_' + str(i) for i in range( len(names)+1, ncols ) ]
+    return [ 'Step' ] + names
+
+# LAMMPS log with `chunks` runs of `rows` thermo rows and `columns` columns
+# (Step included). `warnings` WARNING lines are written before each run, where
+# LAMMPS prints them while setting up (a WARNING ends a thermo chunk).
+def writeLog( fileName, rows, columns=10, chunks=1, warnings=0,
+              phi=0.9, seed=0 ):
+    header = thermoColumns( columns )
+    step   = 0
+    with open( fileName, 'w' ) as f:
+        f.write( 'LAMMPS (synthetic)\nunits real\natom_style full\n' )
+        for chunk in range( chunks ):
+            for i in range( warnings ):
+                f.write( 'WARNING: synthetic warning ' + str(i) + ' (src/synthetic.cpp:1)\n' )
+            f.write( 'Setting up run ...\n' )
+            f.write( 'Memory usage per processor = 10.2 Mbytes\n' )
+            f.write( ' '.join( header ) + ' \n' )
+
+            values = 300.0 + ar1( rows, columns-1, phi, seed + chunk )
+            steps  = step + 10 * np.arange( rows )
+            table  = np.column_stack( [ steps, values ] )
+            np.savetxt( f, table, fmt=['%10d'] + ['%14.6f'] * (columns-1) )
+            step  += 10 * rows
+
+            f.write( 'Loop time of 12.34 on 4 procs for ' + str(rows) + ' steps\n\n' )
+            f.write( 'Pair  time (%) = 10.0 (80.0)\n' )
+
+# LAMMPS dump ('id type x y z') with `frames` frames of `atoms` atoms,
+# the positions of every atom following an AR(1) series over the frames
+def writeDump( fileName, frames, atoms, phi=0.9, seed=0 ):
+    positions = 5.0 + ar1( frames, 3*atoms, phi, seed ).reshape( frames, atoms, 3 )
+    ids   = np.arange( 1, atoms+1 )
+    types = ids % 2 + 1
+    with open( fileName, 'w' ) as f:
+        for frame in range( frames ):
+            f.write( 'ITEM: TIMESTEP\n' + str(100*frame) + '\n' )
+            f.write( 'ITEM: NUMBER OF ATOMS\n' + str(atoms) + '\n' )
+            f.write( 'ITEM: BOX BOUNDS pp pp pp\n0.0 10.0\n0.0 10.0\n0.0 10.0\n' )
+            f.write( 'ITEM: ATOMS id type x y z\n' )
+            table = np.column_stack( [ ids, types, positions[frame] ] )
+            np.savetxt( f, table, fmt=['%d', '%d', '%.5f', '%.5f', '%.5f'] )
+
+# XYZ trajectory with `frames` frames of `atoms` atoms ('element x y z')
+def writeXYZ( fileName, frames, atoms, phi=0.9, seed=0 ):
+    positions = 5.0 + ar1( frames, 3*atoms, phi, seed ).reshape( frames, atoms, 3 )
+    elements  = np.where( np.arange( atoms ) % 3 == 0, 'O', 'H' )
+    with open( fileName, 'w' ) as f:
+        for frame in range( frames ):
+            f.write( str(atoms) + '\nframe ' + str(frame) + '\n' )
+            f.write( ''.join( '%s %.5f %.5f %.5f\n' % ( element, x, y, z )
+                              for element, (x, y, z) in zip( elements, positions[frame] ) ) )
+
+# fix ave/time output with `rows` timesteps of `columns` quantities, in
+# vector mode with `vectorRows` rows per timestep when vectorRows > 0
+def writeCompute( fileName, rows, columns=4, vectorRows=0, phi=0.9, seed=0 ):
+    names = [ 'c_ave[' + str(i) + ']' for i in range( 1, columns+1 ) ]
+    steps = 10 * np.arange( 1, rows+1 )
+    with open( fileName, 'w' ) as f:
+        f.write( '# Time-averaged data for fix ave\n' )
+        if not vectorRows:
+            f.write( '# TimeStep ' + ' '.join( names ) + '\n' )
+            table = np.column_stack( [ steps, ar1( rows, columns, phi, seed ) ] )
+            np.savetxt( f, table, fmt=['%d'] + ['%.8g'] * columns )
+            return
+        f.write( '# TimeStep Number-of-rows\n# Row ' + ' '.join( names ) + '\n' )
+        values = ar1( rows, vectorRows * columns, phi, seed )
+        index  = np.arange( 1, vectorRows+1 )
+        for k in range( rows ):
+            f.write( '%d %d\n' % ( steps[k], vectorRows ) )
+            table = np.column_stack( [ index, values[k].reshape( vectorRows, columns ) ] )
+            np.savetxt( f, table, fmt=['%d'] + ['%.8g'] * columns )
+
+# Compressed copy of a file (gzip, bz2 or xz), returns its name
+compressedSuffix = { 'gzip' : '.gz', 'bz2' : '.bz2', 'xz' : '.xz' }
+
+def compressFile( fileName, kind ):
+    compressed = fileName + compressedSuffix[kind]
+    if kind == 'xz':
+        with open( compressed, 'wb' ) as out:
+            subprocess.check_call( [ 'xz', '-c', fileName ], stdout=out )
+        return compressed
+    opener = gzip.open if kind == 'gzip' else bz2.BZ2File
+    with open( fileName, 'rb' ) as f:
+        out = opener( compressed, 'wb' )
+        try:
+            shutil.copyfileobj( f, out, 2**20 )
+        finally:
+            out.close()
+    return compressed
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# Batch version of block.log.py: block averaging (Flyvbjerg & Petersen)
+#   of many independent files (replicas, state points, ...) over a pool
+#   of worker processes, aggregated into one summary table
+
+# Standard Library
+import argparse
+from collections import OrderedDict
+
+import utils.parserIO as io
+import utils.batch    as batch
+
+#---------------------------------#
+#   Get Command line options      #
+#---------------------------------#
+parser = argparse.ArgumentParser(description="Perform block averaging  \
+                                using method of Flyvbjerg + Petersen (JCP, 1989) \
+                                over many files in parallel and report the \
+                                plateau standard error of every property \
+                                in one summary table.")
+parser.add_argument( "filetype", default="LAMMPS_Log", type=str,
+                      help="File type / format of the files to use for \
+                            reading in data. Default is LAMMPS file format")
+parser.add_argument( "files", type=str, nargs="*",
+                      help="Filenames or glob patterns (quote them) of the files." )
+parser.add_argument( "-m", "--manifest", type=str, default=None,
+                      help="File listing one filename or glob pattern per line." )
+parser.add_argument( "-c", "--columns", type=str, nargs="+", default=["all"],
+                     help="Properties to block (default: 'all' numeric columns)." )
+parser.add_argument( "-j", "--workers", type=int, default=None,
+                     help="Number of worker processes (default: # of CPUs)" )
+parser.add_argument( "-p", "--print-precision", type=int, default=3, dest='printPrecision',
+                     help="Decimal precision for print out. (default = 3)")
+parser.add_argument( "--skip_rows", default=0, type=int,
+                     help="Skip this number of rows before block averaging (skip equilibration)" )
+parser.add_argument( "--engine", default="numpy", choices=["numpy", "python"],
+                     help="Blocking engine (see block.log.py)" )
+parser.add_argument( "--cache", action="store_true",
+                     help="Read through the parse cache (see block.log.py)" )
+parser.add_argument( "--cache-dir", default=None, dest='cacheDir',
+                     help="Directory of the parsed column cache" )
+parser.add_argument( "-o", "--output", type=str, default=None,
+                     help="Also write the summary to this .csv or .json file" )
+
+args = parser.parse_args()
+
+#-----------------------------------------------#
+#   Error checking of command line options      #
+#-----------------------------------------------#
+if not args.files and not args.manifest:
+    raise Exception("No files or manifest specified.")
+
+#-----------------------------#
+#   Run the batch             #
+#-----------------------------#
+files = batch.expandFiles( args.files, args.manifest )
+
+if args.columns == [ io.allColumns ]:
+    columns = io.allColumns
+else:
+    columns = OrderedDict( (prop, float) for prop in args.columns )
+
+rows = batch.runBatch( files, args.filetype, columns,
+                       skipRows=args.skip_rows, workers=args.workers,
+                       engine=args.engine, cacheDir=args.cacheDir,
+                       cache=args.cache )
+
+batch.printSummary( rows, args.printPrecision )
+if args.output:
+    batch.writeSummary( rows, args.output )
@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+# Convert text LAMMPS output once into a binary column store: one .npy file
+#   per column per data chunk and a manifest.json, read back memory mapped
+#   with the 'store' file type, e.g.
+#     block.convert.py log log.lammps -o log.columns
+#     block.log.py store log.columns PotEng
+
+# Standard Library
+import argparse
+from collections import OrderedDict
+
+import utils.parserIO    as io
+import utils.columnstore as columnstore
+
+#---------------------------------#
+#   Get Command line options      #
+#---------------------------------#
+parser = argparse.ArgumentParser(description="Parse FILENAME once with any \
+                                file type reader and write its columns to a \
+                                memory mappable binary column store.")
+parser.add_argument( "filetype", default="LAMMPS_Log", type=str,
+                      help="File type / format of FILENAME to use for \
+                            reading in data. Default is LAMMPS file format")
+parser.add_argument( "filename", type=str,
+                      help="Filename that contains data." )
+parser.add_argument( "-c", "--columns", type=str, nargs="+", default=["all"],
+                     help="Properties to store (default: 'all' numeric columns)." )
+parser.add_argument( "-o", "--output", type=str, default=None,
+                     help="Directory of the column store (default: FILENAME.columns)" )
+parser.add_argument( "--dtype", default="float64", choices=["float64", "float32"],
+                     help="Data type the floating point columns are stored in \
+                           (Step and other integer valued columns are kept as int64)" )
+
+args = parser.parse_args()
+
+#-----------------------------------------------#
+#   Error checking of command line options      #
+#-----------------------------------------------#
+if not args.filename:
+    raise Exception("No filename specified.")
+
+#-----------------------------#
+#   Convert                   #
+#-----------------------------#
+if args.columns == [ io.allColumns ]:
+    columns = io.allColumns
+else:
+    # parsed as float64, convert() casts to --dtype after keeping the
+    # integer valued columns (Step) as int64
+    columns = OrderedDict( (prop, float) for prop in args.columns )
+
+storeDir = args.output or args.filename + '.columns'
+manifest = columnstore.convert( io.selectFileType( args.filetype ), args.filename,
+                                storeDir, columns, dtype=args.dtype )
+
+print "Column store: ", storeDir
+for chunk in manifest["chunks"]:
+    print "  chunk {0: <8} rows {1: <10} steps {2: <24} {3}".format(
+          chunk["key"], chunk["rows"], chunk["steps"], ' '.join( chunk["header"] ) )
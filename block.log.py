@@ -5,15 +5,17 @@
 # Standard Library
 import sys, os
 import math
+import time
 import argparse
+from collections import OrderedDict
 
 # 3rd-Party Library
 import numpy as np
-import matplotlib.pyplot as plt 
 
 import utils.parserIO as io
 import utils.blocking as blocking
-from   utils.welford import Welford
+from   utils.cache   import ParseCache
+import utils.profiling as profiling
 
 #---------------------------------#
 #   Get Command line options      #
@@ -28,15 +30,97 @@ parser.add_argument( "filetype", default="LAMMPS_Log", type=str,
                             reading in data. Default is LAMMPS file format")
 parser.add_argument( "filename", type=str,
                       help="Filename that contains data." )
-parser.add_argument( "property", type=str,
-                     help="String of property in FILENAME that we would \
-                           like to perform block averaging over.")
+parser.add_argument( "property", type=str, nargs="+",
+                     help="String(s) of the properties in FILENAME that we would \
+                           like to perform block averaging over. They are parsed \
+                           in one pass and blocked together. Use 'all' for every \
+                           numeric column.")
 parser.add_argument( "-p", "--print-precision", type=int, default=None, dest='printPrecision',
                      help="Decimal precision for print out. (class default = 3")
 parser.add_argument( "--plot", action="store_true",
-                     help="Turn on plotting using PyPlot" )
+                     help="Turn on plotting using PyPlot (saved to \
+                           block.chunk<N>.png when there is no display)" )
 parser.add_argument( "--skip_rows", default=0, type=int,
                      help="Skip this number of rows before block averaging (skip equilibration)" )
+parser.add_argument( "-m", "--method", default="Flyvbjerg+Petersen", type=str,
+                     help="Error analysis method: Flyvbjerg+Petersen (default), \
+                           Covariance (full covariance of the block means of \
+                           several properties), SetBlocks (any list of block sizes), \
+                           Bootstrap (block bootstrap of the block means), \
+                           Jackknife (leave-one-block-out errors of --estimator) \
+                           or Autocorrelation (FFT integrated autocorrelation time)" )
+parser.add_argument( "--block-sizes", type=int, nargs="+", default=None, dest='blockSizes',
+                     help="Block sizes scanned by the SetBlocks method \
+                           (default: 200 log-spaced sizes up to N/2) or the \
+                           Bootstrap method (default: powers of 2 from the \
+                           first giving at most 4096 blocks)" )
+parser.add_argument( "--replicates", default=10000, type=int,
+                     help="Number of bootstrap resamples per block size (Bootstrap \
+                           method). Each draws one index per block: the cost \
+                           grows as replicates x blocks of all scanned sizes" )
+parser.add_argument( "--seed", default=0, type=int,
+                     help="Seed of the bootstrap resampling (Bootstrap method)" )
+parser.add_argument( "--workers", default=None, type=int,
+                     help="Processes the bootstrap resamples are spread over \
+                           (Bootstrap method, default: 1)" )
+parser.add_argument( "--engine", default="numpy", choices=["numpy", "python"],
+                     help="Blocking engine: vectorized NumPy arrays (default) or \
+                           the pure Python reference implementation" )
+parser.add_argument( "--cache-dir", default=None, dest='cacheDir',
+                     help="Directory of the parsed column cache \
+                           (default: $LMPS_BLOCKING_CACHE or ~/.cache/lmps_blocking)" )
+parser.add_argument( "--cache-size", default=2048, type=float, dest='cacheSize',
+                     help="Maximum size of the parse cache in MB before the \
+                           least recently used entries are evicted" )
+parser.add_argument( "--no-cache", action="store_false", dest='cache',
+                     help="Bypass the parse cache and always parse FILENAME" )
+parser.add_argument( "--rebuild-cache", action="store_true", dest='rebuildCache',
+                     help="Re-parse FILENAME and replace its cache entry" )
+parser.add_argument( "--dtype", default="float64", choices=["float64", "float32"],
+                     help="Data type the property columns are parsed into and \
+                           kept in the parse cache (float32 halves the size of \
+                           cache entries; blocking is always done in float64)" )
+parser.add_argument( "--follow", action="store_true",
+                     help="Follow a LAMMPS log that is still being written: \
+                           poll for new thermo rows, block them incrementally \
+                           and re-print the table (Ctrl-C to stop)" )
+parser.add_argument( "--interval", default=10.0, type=float,
+                     help="Seconds between polls of FILENAME in --follow mode" )
+parser.add_argument( "--chunks", type=int, nargs="+", default=None,
+                     help="Only read these thermo chunks of a LAMMPS log, numbered \
+                           as printed from 1 (negative numbers count from the \
+                           last chunk, e.g. -1)" )
+parser.add_argument( "--steps", type=int, nargs=2, default=None, metavar=("FIRST", "LAST"),
+                     help="Only read the thermo chunks of a LAMMPS log that overlap \
+                           this Step range" )
+parser.add_argument( "--estimator", default=None, type=str, nargs="+",
+                     help="Functions of the property averages whose jackknife \
+                           errors the Jackknife method reports, as NumPy \
+                           expressions of the property names (the average of a \
+                           property) and NAME_sq (the average of its square), \
+                           e.g. 'PotEng_sq - PotEng**2' or 'Temp / Volume'. \
+                           m[:,i] is the average of the i-th property" )
+parser.add_argument( "--merge", action="store_true",
+                     help="Block all (selected) chunks together as one trajectory \
+                           with the Flyvbjerg+Petersen method instead of each \
+                           chunk on its own. The repeated first row of a run \
+                           that continues the previous one (same Step) is dropped" )
+parser.add_argument( "--save-summary", default=None, dest='saveSummary', metavar="FILE",
+                     help="Save the merged blocking state (.npz) so later restart \
+                           logs can be added with --load-summary (implies --merge)" )
+parser.add_argument( "--load-summary", nargs="+", default=None, dest='loadSummary',
+                     metavar="FILE",
+                     help="Continue the merged blocking of earlier segments from \
+                           their saved summaries, FILENAME being the next restart \
+                           log (implies --merge). Summaries of independently \
+                           blocked segments are pooled level by level in order" )
+parser.add_argument( "--profile", nargs="?", const="table", default=None,
+                     choices=["table", "json"],
+                     help="Report wall / CPU time, bytes, rows and peak memory of \
+                           every phase and run chunk to stderr, as a table \
+                           (default) or JSON lines" )
+parser.add_argument( "--profile-output", default=None, dest='profileOutput',
+                     help="Write the --profile report to this file instead of stderr" )
 
 args = parser.parse_args()
 
@@ -50,13 +134,211 @@ if not args.property:
     raise Exception("No property string specified.")
 
 
+if args.engine == "python" and ( len(args.property) > 1 or args.property == [ io.allColumns ] ):
+    raise Exception("The python blocking engine takes a single property, " \
+                    "use the numpy engine to block several properties.")
+
+if args.follow and not isinstance( io.selectFileType(args.filetype), io.LAMMPSLog ):
+    raise Exception("--follow is only supported for LAMMPS log files.")
+
+if ( args.chunks or args.steps ) and \
+        ( args.follow or not isinstance( io.selectFileType(args.filetype), io.LAMMPSLog ) ):
+    raise Exception("--chunks and --steps are only supported for LAMMPS log files.")
+
+if args.chunks and 0 in args.chunks:
+    raise Exception("--chunks are numbered from 1 (or from -1 for the last chunk).")
+
+if args.estimator and not isinstance( blocking.selectBlockMethod( args.method ),
+                                     blocking.blockJackknife ):
+    raise Exception("--estimator is only used by the Jackknife method.")
+
+if args.saveSummary or args.loadSummary:
+    args.merge = True
+
+if args.merge and args.follow:
+    raise Exception("--merge is not supported in --follow mode.")
+
+if ( args.merge or args.follow ) and type( blocking.selectBlockMethod( args.method ) ) not in \
+        ( blocking.blockFlyvbjergPetersen, blocking.blockFlyvbjergPetersenOnline ):
+    raise Exception("--merge and --follow block with the Flyvbjerg+Petersen method only.")
+
+chunks = None
+if args.chunks:
+    chunks = [ chunk - 1 if chunk > 0 else chunk for chunk in args.chunks ]
+
+#-----------------------------------#
+#   Profiling of the run phases     #
+#-----------------------------------#
+profiler = profiling.getProfiler()
+if args.profile:
+    profiler = profiling.setProfiler( profiling.Profiler() )
+
+def reportProfile():
+    if not args.profile: return
+    stream = open( args.profileOutput, 'w' ) if args.profileOutput else sys.stderr
+    if args.profile == "json":
+        profiler.writeJSONLines( stream )
+    else:
+        profiler.printTable( stream )
+    if args.profileOutput: stream.close()
+
+#-----------------------------------#
+#   Columns of one data chunk as a  #
+#   (samples x properties) array    #
+#-----------------------------------#
+def stackColumns( value, skip_rows=0 ):
+    properties = list( value )
+    if len(properties) == 1:
+        data = np.asarray( value[properties[0]][skip_rows:], dtype=float )
+    else:
+        data = np.column_stack( [ value[prop][skip_rows:]
+                                  for prop in properties ] ).astype( float )
+    return properties, data
+
+#-----------------------------------#
+#   --estimator expressions as one  #
+#   vectorized function of the      #
+#   (n x 2k) averages of the k      #
+#   properties and their squares    #
+#-----------------------------------#
+def withSquares( data ):
+    if data.ndim == 1:
+        data = data[:,np.newaxis]
+    return np.column_stack( [ data, data * data ] )
+
+def jackknifeEstimator( properties ):
+    codes = [ compile( expression, '--estimator', 'eval' ) for expression in args.estimator ]
+    k = len(properties)
+    def estimator( m ):
+        names = { 'np' : np, 'm' : m }
+        for i, prop in enumerate( properties ):
+            names[prop] = m[:,i]
+            names[prop + '_sq'] = m[:,k+i]
+        values = [ np.broadcast_to( eval( code, names ), m.shape[:1] ) for code in codes ]
+        return values[0] if len(values) == 1 else np.column_stack( values )
+    return estimator
+
+def blockingKwargs( properties ):
+    kwargs = dict()
+    method = blocking.selectBlockMethod( args.method )
+    if isinstance( method, blocking.blockFlyvbjergPetersen ):
+        kwargs['engine'] = args.engine
+    if isinstance( method, blocking.blockSetBlocks ):
+        kwargs['blockSizes'] = args.blockSizes
+    if isinstance( method, blocking.blockBootstrap ):
+        kwargs['replicates'] = args.replicates
+        kwargs['seed']       = args.seed
+        kwargs['workers']    = args.workers
+    if len(properties) > 1:
+        kwargs['labels'] = properties
+    if isinstance( method, blocking.blockJackknife ) and args.estimator:
+        kwargs['estimator'] = jackknifeEstimator( properties )
+        kwargs['labels'] = args.estimator if len(args.estimator) > 1 else None
+    if args.printPrecision is not None:
+        kwargs['printPrecision'] = args.printPrecision
+    return kwargs
+
+# Options of the online Flyvbjerg+Petersen blocking of --follow and --merge
+def onlineKwargs( properties ):
+    kwargs = dict( engine=args.engine )
+    if len(properties) > 1:
+        kwargs['labels'] = properties
+    if args.printPrecision is not None:
+        kwargs['printPrecision'] = args.printPrecision
+    return kwargs
+
+if args.property == [ io.allColumns ]:
+    thermo_cols = io.allColumns
+else:
+    thermo_cols = OrderedDict( (prop, np.dtype(args.dtype).type)
+                               for prop in args.property )
+
+# Step column read along for finding the seams between merged runs
+stepColumn = None
+if args.merge and thermo_cols != io.allColumns and 'Step' not in thermo_cols \
+              and isinstance( io.selectFileType(args.filetype), io.LAMMPSLog ):
+    stepColumn = 'Step'
+    thermo_cols['Step'] = int
+
+#-----------------------------------#
+#   Follow a running simulation:    #
+#   only new rows are parsed and    #
+#   pushed into online blocking     #
+#-----------------------------------#
+if args.follow:
+    follower = io.LAMMPSLogFollower( args.filename, thermo_cols )
+    online   = OrderedDict()
+    try:
+        while True:
+            for key, value in follower.poll().items():
+                properties, data = stackColumns( value )
+                if key not in online:
+                    online[key] = { 'rows' : 0, 'blocking' : 
+                        blocking.selectBlockMethod( "Online",
+                                                    **onlineKwargs(properties) ) }
+                skip = max( 0, args.skip_rows - online[key]['rows'] )
+                online[key]['rows'] += len(data)
+                bData = online[key]['blocking']
+                with profiler.phase( 'block', chunk=key, rows=len(data)-skip ):
+                    bData.push( data[skip:] )
+
+                print "Data file chunk: ", key+1, "  samples: ", bData.nsamples, \
+                      "  ", time.strftime("%Y-%m-%d %H:%M:%S")
+                bData.printScanBlocking()
+                sys.stdout.flush()
+            time.sleep( args.interval )
+    except KeyboardInterrupt:
+        pass
+    reportProfile()
+    sys.exit(0)
+
 #-----------------------------#
 #   Read in Log File          #
 #-----------------------------#
 f = io.selectFileType( args.filetype )
 
-thermo_string = args.property
-data_dict = f.readData( args.filename, { thermo_string : float } )
+cache = ParseCache( args.cacheDir, maxBytes=int(args.cacheSize*1024**2),
+                    enabled=args.cache, rebuild=args.rebuildCache )
+data_dict = cache.readData( f, args.filename, thermo_cols,
+                            chunks=chunks, steps=args.steps )
+
+#-------------------------------#
+#    Merge all chunks into one  #
+#    trajectory wide table      #
+#-------------------------------#
+if args.merge:
+    bData = None
+    for key in sorted( data_dict ):
+        value = data_dict[key]
+        steps = value.pop( stepColumn, None ) if stepColumn else value.get( 'Step' )
+        properties, data = stackColumns( value )
+        if bData is None:
+            bData = blocking.selectBlockMethod( "Online", **onlineKwargs(properties) )
+            for i, summary in enumerate( args.loadSummary or [] ):
+                segment = blocking.selectBlockMethod( "Online", **onlineKwargs(properties) )
+                bData = segment.load( summary ) if i == 0 else bData.combine( segment.load( summary ) )
+        skip = args.skip_rows if bData.nsamples == 0 else 0
+        with profiler.phase( 'block', chunk=key, bytes=data.nbytes, rows=len(data) ):
+            bData.pushSegment( data[skip:], None if steps is None else steps[skip:] )
+
+    if bData is None:
+        raise Exception("No data chunks found in " + args.filename)
+    print "Data file chunks: ", ' '.join( str(key+1) for key in sorted( data_dict ) ), \
+          "  merged samples: ", bData.nsamples
+    with profiler.phase( 'output' ):
+        bData.printScanBlocking()
+    if args.saveSummary:
+        bData.save( args.saveSummary )
+        print "Blocking summary saved to", args.saveSummary
+    if args.plot:
+        with profiler.phase( 'plot' ):
+            plotFile = None
+            if not blocking.interactive():
+                plotFile = "block.merged.png"
+                print "Plot saved to", plotFile
+            bData.plotScanBlocking( plotFile )
+    reportProfile()
+    sys.exit(0)
 
 #-------------------------------#
 #    Loop over data             #
@@ -64,7 +346,7 @@ data_dict = f.readData( args.filename, { thermo_string : float } )
 for key, value in data_dict.items():
 
     print "Data file chunk: ", key+1
-    data = value[thermo_string][args.skip_rows:]
+    properties, data = stackColumns( value, args.skip_rows )
 
     #-------------------------------#
     #    Initialization - Blocking  #
@@ -74,22 +356,21 @@ for key, value in data_dict.items():
     ylisthi = []
     ylistlo = []
 
-    stats = Welford()
-    stats(data)
-    totalMean = stats.mean
-    totalStd  = stats.std
-    totalVar  = stats.std * stats.std
+    totalMean = data.mean( axis=0 )
+    totalStd  = data.std( axis=0, ddof=1 )
+    totalVar  = totalStd * totalStd
 
     #--------------------------------#
     #   Perform blocking eval on PE  #
     #--------------------------------#
-    kwargs = dict()
-    if args.printPrecision is not None:
-        kwargs = { 'printPrecision' : args.printPrecision }
-  
-    bData = blocking.selectBlockMethod( "Flyvbjerg+Petersen", **kwargs )
-    bData.scanBlocking( data )
-    bData.printScanBlocking()
+    bData = blocking.selectBlockMethod( args.method,
+                                        **blockingKwargs(properties) )
+    if args.estimator:
+        data = withSquares( data )
+    with profiler.phase( 'block', chunk=key, bytes=data.nbytes, rows=len(data) ):
+        bData.scanBlocking( data )
+    with profiler.phase( 'output', chunk=key ):
+        bData.printScanBlocking()
 
     #-----------------------------#
     #   Plot Std. Dev. and its    #
@@ -97,5 +378,12 @@ for key, value in data_dict.items():
     #   plateau of blocking       #
     #-----------------------------#
     if args.plot:
-        bData.plotScanBlocking()
+        with profiler.phase( 'plot', chunk=key ):
+            plotFile = None
+            if not blocking.interactive():
+                plotFile = "block.chunk" + str(key+1) + ".png"
+                print "Plot saved to", plotFile
+            bData.plotScanBlocking( plotFile )
+
+reportProfile()
 
@@ -0,0 +1,153 @@
+import os, glob
+import json, csv
+import multiprocessing
+import numpy as np
+from collections import OrderedDict
+
+import parserIO as io
+import blocking
+from cache import ParseCache
+
+summaryFields = [ "file", "chunk", "property", "samples", "mean",
+                  "plateau", "blocks", "std_err", "std_err_plus",
+                  "std_err_minus", "error" ]
+
+#---------------------------------------------------------------------------------#
+#   Expand glob patterns and manifest files (one filename / pattern per line,     #
+#   blank lines and '#' comments ignored) into an ordered list of files           #
+#---------------------------------------------------------------------------------#
+def expandFiles( patterns=None, manifest=None ):
+    patterns = list( patterns or [] )
+    if manifest:
+        base = os.path.dirname( os.path.abspath(manifest) )
+        with open( manifest, 'r' ) as f:
+            for line in f:
+                line = line.split('#')[0].strip()
+                if line:
+                    patterns.append( os.path.join( base, line ) )
+
+    files = []
+    for pattern in patterns:
+        matches = sorted( glob.glob( os.path.expanduser(pattern) ) )
+        if not matches:
+            raise Exception('No files match "' + pattern + '".')
+        for fileName in matches:
+            if fileName not in files:
+                files.append( fileName )
+    return files
+
+#---------------------------------------------------------------------------------#
+#   Parse + block one file: one summary row per chunk and property                #
+#---------------------------------------------------------------------------------#
+def analyseFile( job ):
+    fileName = job["file"]
+    try:
+        reader = io.selectFileType( job["filetype"] )
+        cache  = ParseCache( job.get("cacheDir"), enabled=job.get("cache", False) )
+        data_dict = cache.readData( reader, fileName, job["columns"] )
+        if not data_dict:
+            raise Exception("No data chunks found.")
+
+        rows = []
+        for chunk, value in sorted( data_dict.items() ):
+            properties = list( value )
+            data = np.column_stack( [ value[prop][job["skip_rows"]:]
+                                      for prop in properties ] ).astype( float )
+
+            # (blocking, plateau, column): the python engine blocks a
+            # single property at a time, numpy all of them together
+            if job["engine"] == "python":
+                scans = []
+                for i in range( len(properties) ):
+                    bData = blocking.selectBlockMethod( "Flyvbjerg+Petersen",
+                                                        engine="python" )
+                    bData.scanBlocking( data[:,i] )
+                    scans.append( ( bData, bData.plateau(), None ) )
+            else:
+                bData = blocking.selectBlockMethod( "Flyvbjerg+Petersen",
+                                                    engine=job["engine"] )
+                bData.scanBlocking( data )
+                plateaus = bData.plateau() or [ None ] * len(properties)
+                scans = [ ( bData, plateaus[i], i ) for i in range( len(properties) ) ]
+
+            for i, prop in enumerate( properties ):
+                row = OrderedDict( (field, None) for field in summaryFields )
+                row.update( file=fileName, chunk=chunk+1, property=prop,
+                            samples=len(data), mean=float( data[:,i].mean() ) )
+
+                bData, M, column = scans[i]
+                if M is not None:
+                    level = bData.blockDict[M]
+                    value = lambda key: float( level[key] if column is None
+                                               else level[key][column] )
+                    row.update( plateau=M, blocks=level["length"],
+                                std_err=value("std"),
+                                std_err_plus=value("std_plus"),
+                                std_err_minus=value("std_minus") )
+                rows.append( row )
+        return rows
+
+    except Exception as e:
+        row = OrderedDict( (field, None) for field in summaryFields )
+        row.update( file=fileName, error=str(e) )
+        return [ row ]
+
+#---------------------------------------------------------------------------------#
+#   Run the jobs for all files over a pool of worker processes                    #
+#---------------------------------------------------------------------------------#
+def runBatch( files, fileType, columns, skipRows=0, workers=None,
+              engine="numpy", cacheDir=None, cache=False ):
+    jobs = [ { "file"      : fileName,
+               "filetype"  : fileType,
+               "columns"   : columns,
+               "skip_rows" : skipRows,
+               "engine"    : engine,
+               "cacheDir"  : cacheDir,
+               "cache"     : cache } for fileName in files ]
+
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    workers = max( 1, min( workers, len(jobs) ) )
+
+    if workers == 1:
+        results = map( analyseFile, jobs )
+    else:
+        pool = multiprocessing.Pool( workers )
+        try:
+            results = pool.map( analyseFile, jobs, chunksize=1 )
+        finally:
+            pool.close()
+            pool.join()
+
+    return [ row for rows in results for row in rows ]
+
+#---------------------------------------------------------------------------------#
+#   Output of the aggregated summary table                                        #
+#---------------------------------------------------------------------------------#
+def printSummary( rows, prec=3 ):
+    width = max( [ len(row["file"]) for row in rows ] + [ 4 ] )
+    pwidth = max( [ len(row["property"] or "") for row in rows ] + [ 8 ] )
+    print "{0: <{w}} CHUNK {1: <{pw}} SAMPLES  MEAN  M  #BLCKS  STD_ERR  STD_ERR+  STD_ERR-".format(\
+          "FILE", "PROPERTY", w=width, pw=pwidth)
+    print "-" * ( width + pwidth + 70 )
+    for row in rows:
+        if row["error"]:
+            print "{0: <{w}} ERROR: {1}".format( row["file"], row["error"], w=width )
+        elif row["plateau"] is None:
+            print "{file: <{w}} {chunk: <5} {property: <{pw}} {samples: <8} " \
+                  "{mean:.{prec}f}  no plateau reached".format(\
+                  w=width, pw=pwidth, prec=prec, **row)
+        else:
+            print "{file: <{w}} {chunk: <5} {property: <{pw}} {samples: <8} " \
+                  "{mean:.{prec}f} {plateau: <2} {blocks: <7} {std_err:.{prec}f} " \
+                  "{std_err_plus:.{prec}f} {std_err_minus:.{prec}f}".format(\
+                  w=width, pw=pwidth, prec=prec, **row)
+
+def writeSummary( rows, fileName ):
+    with open( fileName, 'w' ) as f:
+        if fileName.endswith('.json'):
+            json.dump( rows, f, indent=1 )
+        else:
+            writer = csv.DictWriter( f, fieldnames=summaryFields )
+            writer.writeheader()
+            writer.writerows( rows )
@@ -1,6 +1,6 @@
 import numpy             as np
-import matplotlib.pyplot as plt
 import sys,os, math
+import multiprocessing
 from welford import Welford
 #----------------------------------------------------------------------#
 def selectBlockMethod( method, **kwargs ):
@@ -10,33 +10,208 @@ def selectBlockMethod( method, **kwargs ):
 
     elif    method == "SetBlocks" or method == "setBlocks" \
          or method == "Standard"  or method == "standard":
-        return blockSetBlocks( methodm, **kwargs )
+        return blockSetBlocks( method, **kwargs )
+
+    elif    method == "Online" or method == "online" \
+         or method == "Streaming" or method == "streaming" \
+         or method == "FP-online":
+        return blockFlyvbjergPetersenOnline( method, **kwargs )
+
+    elif    method == "Covariance" or method == "covariance" \
+         or method == "cov" or method == "FP-covariance":
+        return blockCovariance( method, **kwargs )
+
+    elif    method == "Jackknife" or method == "jackknife" \
+         or method == "JK" or method == "jk":
+        return blockJackknife( method, **kwargs )
+
+    elif    method == "Bootstrap" or method == "bootstrap" \
+         or method == "BlockBootstrap" or method == "block-bootstrap":
+        return blockBootstrap( method, **kwargs )
+
+    elif    method == "Autocorrelation" or method == "autocorrelation" \
+         or method == "ACF" or method == "acf" or method == "FFT":
+        return blockAutocorrelation( method, **kwargs )
 
     else:
         raise Exception('Blocking method "' + method + '" not supported (...yet)')
 
+#----------------------------------------------------------------------#
+#   matplotlib is only imported once something is plotted, with the    #
+#   non-interactive Agg backend when there is no display (headless     #
+#   cluster nodes) unless a backend is chosen through MPLBACKEND       #
+#----------------------------------------------------------------------#
+def headless():
+    return sys.platform.startswith('linux') and \
+           not os.environ.get('DISPLAY') and not os.environ.get('WAYLAND_DISPLAY')
+
+def pyplot():
+    if 'matplotlib.pyplot' not in sys.modules:
+        import matplotlib
+        if headless() and not os.environ.get('MPLBACKEND'):
+            matplotlib.use( 'Agg' )
+    import matplotlib.pyplot as plt
+    return plt
+
+def interactive():
+    plt = pyplot()
+    import matplotlib.rcsetup as rcsetup
+    return plt.get_backend().lower() in \
+           [ backend.lower() for backend in rcsetup.interactive_bk ]
+
+# Shows the current figure, or saves it to fileName (e.g. when headless)
+def showPlot( plt, fileName=None ):
+    if fileName:
+        plt.savefig( fileName )
+        plt.close()
+    else:
+        plt.show()
+
+#----------------------------------------------------------------------#
+#   Statistics of the block averages at one blocking level             #
+#   (Flyvbjerg + Petersen, Eqs. 27-28) from the number of blocks,      #
+#   their mean and their sample variance                               #
+#----------------------------------------------------------------------#
+def blockStats( length, mean, variance ):
+    Lminus1 = float( length ) - 1.0
+
+    var      = variance / Lminus1
+    varStd   = math.sqrt( 2.0 / Lminus1 )
+    varPlus  = var * ( 1.0 + varStd )
+    varMinus = var * ( 1.0 - varStd )
+
+    std      = np.sqrt( var )
+    stdStd   = 1.0 / math.sqrt( 2.0 * Lminus1 )
+    stdPlus  = std * ( 1.0 + stdStd )
+    stdMinus = std * ( 1.0 - stdStd )
+
+    return { "length"    : length,
+             "mean"      : mean,
+             "var"       : var,
+             "var_plus"  : varPlus,
+             "var_minus" : varMinus,
+             "std"       : std,
+             "std_plus"  : stdPlus,
+             "std_minus" : stdMinus
+    }
+
 #----------------------------------------------------------------------#
 #   Parent Blocking Class - inherited by all others and calls others   #
 #----------------------------------------------------------------------#
 class BlockingMethod( object ):
-    def __init__( self, blockingMethod, printPrecision=3 ):
-        self.type = blockingMethod
-        self.prec = printPrecision
+    def __init__( self, blockingMethod, printPrecision=3, labels=None ):
+        self.type   = blockingMethod
+        self.prec   = printPrecision
+        self.labels = labels
 
     def getBlockedData( self, nblocks, data ):
         return self.block( nblocks, data ) 
 
+    #-----------------------------------------------------------#
+    #   Table of blockDict: keyed by blocking level M (or the   #
+    #   block size B), one row per key and property            #
+    #-----------------------------------------------------------#
+    keyLabel = "M"
+
+    # Names of the properties when several columns were blocked together
+    def columnLabels(self) :
+        blockDict = self.blockDict
+        if not blockDict or np.ndim( blockDict.values()[0]["mean"] ) == 0:
+            return None
+        ncols = len( blockDict.values()[0]["mean"] )
+        if self.labels is not None:
+            return list( self.labels )
+        return [ str(i) for i in range(ncols) ]
+
+    def printScanBlocking(self) :
+        labels = self.columnLabels()
+        if labels is None:
+            print self.keyLabel + " #Blcks  MEAN  VAR  VAR+  VAR-  STD   STD+    STD-"
+            print "---------------------------------------------------"
+            for k, v in sorted( self.blockDict.items() ):
+                print "{M: <2} {length: <4} {mean:.{prec}f} " \
+                      "{var:.{prec}f} {var_plus:.{prec}f} {var_minus:.{prec}f} " \
+                      "{std:.{prec}f} {std_plus:.{prec}f} {std_minus:.{prec}f} ".format(\
+                      M=k, prec=self.prec, **v)
+            return
+
+        width = max( len(label) for label in labels )
+        print self.keyLabel + " #Blcks  {0: <{width}}  MEAN  VAR  VAR+  VAR-  STD   STD+    STD-".format(\
+              "PROPERTY", width=width)
+        print "-----------" + "-" * width + "---------------------------------------------------"
+        for k, v in sorted( self.blockDict.items() ):
+            for i, label in enumerate( labels ):
+                column = dict( (key, v[key][i]) for key in v if key != "length" )
+                print "{M: <2} {length: <5} {label: <{width}} {mean:.{prec}f} " \
+                      "{var:.{prec}f} {var_plus:.{prec}f} {var_minus:.{prec}f} " \
+                      "{std:.{prec}f} {std_plus:.{prec}f} {std_minus:.{prec}f} ".format(\
+                      M=k, length=v["length"], label=label, width=width, 
+                      prec=self.prec, **column)
+
+    #-----------------------------#
+    #   Plot Std. Dev. and its    #
+    #   error bars to determine   #
+    #   plateau of blocking       #
+    #-----------------------------#
+    def plotScanBlocking(self, fileName=None):
+        plt = pyplot()
+        xlist = []
+        ylist = []
+        ylisthi = []
+        ylistlo = []
+
+        for k, v in sorted( self.blockDict.items() ):
+            xlist.append(k)
+            ylist.append(v["std"])
+            ylisthi.append(v["std_plus"])
+            ylistlo.append(v["std_minus"])
+
+
+        x = np.asarray(xlist)
+        y = np.asarray(ylist)
+        yhi = np.asarray(ylisthi)
+        ylo = np.asarray(ylistlo)
+
+        ytop = yhi - y
+        ybot = y - ylo
+
+        labels = self.columnLabels()
+        if labels is None:
+            plt.errorbar( x, y, yerr=(ytop,ybot), fmt='-o' )
+        else:
+            for i, label in enumerate( labels ):
+                plt.errorbar( x, y[:,i], yerr=(ytop[:,i],ybot[:,i]), fmt='-o',
+                              label=label )
+            plt.legend()
+        showPlot( plt, fileName )
+        return
+
 #----------------------------------------------------------------------#
 #   Using the method in Frenkel + Smit Textbook                        #
 #   "Understanding Molecular Simulation"                               #
 #   the Flyvbjerg & Petersen method (J. of Chem. Phys., 1989)          #
 #----------------------------------------------------------------------#
 class blockFlyvbjergPetersen( BlockingMethod ):
+    engines = [ "numpy", "python" ]
+
+    def __init__( self, blockingMethod, printPrecision=3, engine="numpy",
+                        labels=None ):
+        super( blockFlyvbjergPetersen, self ).__init__( blockingMethod,
+                                                        printPrecision,
+                                                        labels )
+        if engine not in self.engines:
+            raise Exception('Blocking engine "' + engine + '" not supported. '
+                            'Choose from: ' + ', '.join(self.engines) )
+        self.engine = engine
+
     @property
     def method(self): return "Flyvbjerg & Petersen Method:" \
                              "   J. of Chem. Phys., Vol. 91 (1), 461-466"
 
     def blockData( self, data ):
+        if self.engine == "numpy":
+            return self.blockDataNumPy( data )
+
         dataBlocked = []
         x = iter( data )
         for i in x:
@@ -45,6 +220,14 @@ class blockFlyvbjergPetersen( BlockingMethod ):
             dataBlocked.append( (i + iPlus1) / 2.0 )
         return dataBlocked
 
+    # Pairwise average of neighbours via a reshape, dropping the trailing
+    # value of an odd length series (same as the iterator version).
+    # A 2-D (samples x properties) array blocks every column at once.
+    def blockDataNumPy( self, data ):
+        data = np.asarray( data, dtype=float )
+        half = len(data) // 2
+        return data[:2*half].reshape( (half, 2) + data.shape[1:] ).mean( axis=1 )
+
     def block( self, nblocks, data ):
         blocks = len(data)
         while blocks > nblocks:
@@ -60,8 +243,40 @@ class blockFlyvbjergPetersen( BlockingMethod ):
         return data
 
     def scanBlocking( self, data ):
+        if self.engine == "numpy":
+            return self.scanBlockingNumPy( data )
+        return self.scanBlockingPython( data )
+
+    def scanBlockingNumPy( self, data ):
+        self.blockDict = {}
+
+        data = np.asarray( data, dtype=float )
+        self.rawStats = None
+        if len(data) >= 2:
+            self.rawStats = blockStats( len(data), data.mean( axis=0 ),
+                                        data.var( axis=0, ddof=1 ) )
+        M = 0
+        while len(data) >= 2:
+            M += 1
+            data = self.blockDataNumPy( data )
+            if len(data) < 2: break
+
+            self.blockDict[M] = blockStats( len(data), data.mean( axis=0 ),
+                                            data.var( axis=0, ddof=1 ) )
+
+    def scanBlockingPython( self, data ):
+        if np.ndim( data ) > 1:
+            raise Exception('The python blocking engine takes a single '
+                            'property, use the numpy engine for '
+                            '(samples x properties) arrays.')
         self.blockDict = {}
 
+        self.rawStats = None
+        if len(data) >= 2:
+            stats = Welford()
+            stats(data)
+            self.rawStats = blockStats( len(data), stats.mean,
+                                        stats.std*stats.std )
         M = 0
         while len(data) >= 2:
             M += 1
@@ -81,92 +296,635 @@ class blockFlyvbjergPetersen( BlockingMethod ):
         
             if len(data) < 2: break
 
-            L = float( len(data) )
-            Lminus1 = L - 1.0
-            
-            var      = stats.std*stats.std
-            var      = var / Lminus1
-            varStd   = math.sqrt( 2.0 / Lminus1 )
-            varPlus  = var * ( 1.0 + varStd )
-            varMinus = var * ( 1.0 - varStd )
-
-            std      = math.sqrt( var )
-            stdStd   = 1.0 / math.sqrt( 2.0 * Lminus1 )
-            stdPlus  = std * ( 1.0 + stdStd ) 
-            stdMinus = std * ( 1.0 - stdStd ) 
- 
-            out = { "length"    : len(data), 
-                    "mean"      : stats.mean,
-                    "var"       : var,
-                    "var_plus"  : varPlus,
-                    "var_minus" : varMinus,
-                    "std"       : std, 
-                    "std_plus"  : stdPlus, 
-                    "std_minus" : stdMinus
-                    
-            }
-            self.blockDict[M] = out
-            
-           
-
-   
+            self.blockDict[M] = blockStats( len(data), stats.mean,
+                                            stats.std*stats.std )
+
+    #-----------------------------------------------------------#
+    #   Start of the plateau: the smallest level M (blocks of   #
+    #   B = 2^M samples) satisfying the criterion of Lee et al. #
+    #   (Phys. Rev. E 83, 066706, 2011)                         #
+    #       B^3 > 2 N ( std(M) / std(0) )^4                     #
+    #   where std(0) is the std. error of the unblocked data.   #
+    #   None if not reached; a list (one per column) for 2-D    #
+    #-----------------------------------------------------------#
+    def plateau(self) :
+        if not self.rawStats or not self.blockDict:
+            return None
+
+        N    = float( self.rawStats["length"] )
+        std0 = np.asarray( self.rawStats["std"], dtype=float )
+        optimal = np.zeros( std0.shape, dtype=int )
+        with np.errstate( divide='ignore', invalid='ignore' ):
+            for M in sorted( self.blockDict, reverse=True ):
+                ratio = self.blockDict[M]["std"] / std0
+                reached = ( 2.0**M )**3 > 2.0 * N * ratio**4
+                optimal = np.where( reached, M, optimal )
+
+        if optimal.ndim == 0:
+            return int(optimal) or None
+        return [ int(M) or None for M in optimal ]
+
+#----------------------------------------------------------------------#
+#   Flyvbjerg & Petersen blocking of the full covariance of a          #
+#   (samples x k) array: every level holds the k x k covariance of     #
+#   the mean, cov / (L - 1) with cov the covariance of the L block     #
+#   means (its diagonal is the "var" of the plain method). Halving     #
+#   and the X^T X reduction act on all columns at once, so errors of   #
+#   functions of several averages come from one sweep (propagate).     #
+#----------------------------------------------------------------------#
+class blockCovariance( blockFlyvbjergPetersen ):
+    engines = [ "numpy" ]
+
+    @property
+    def method(self): return "Flyvbjerg & Petersen Method (covariance):" \
+                             "   J. of Chem. Phys., Vol. 91 (1), 461-466"
+
+    def levelStats( self, data ):
+        L    = len(data)
+        mean = data.mean( axis=0 )
+        x    = data - mean
+        cov  = x.T.dot( x ) / ( L - 1.0 )
+        stats = blockStats( L, mean, np.diag( cov ).copy() )
+        stats["cov"] = cov / ( L - 1.0 )
+        return stats
+
+    def scanBlocking( self, data ):
+        self.blockDict = {}
+
+        data = np.asarray( data, dtype=float )
+        if data.ndim == 1:
+            data = data[:,np.newaxis]
+        self.rawStats = None
+        if len(data) >= 2:
+            self.rawStats = self.levelStats( data )
+        M = 0
+        while len(data) >= 2:
+            M += 1
+            data = self.blockDataNumPy( data )
+            if len(data) < 2: break
+            self.blockDict[M] = self.levelStats( data )
+
+    # Linear error propagation of f(mean) at every level:
+    #   var f = g^T cov g
+    # gradient is the vector g = df/dmean or a function of the means
+    # returning it. Returns { M : std. error of f }
+    def propagate( self, gradient ):
+        errors = {}
+        for M, stats in self.blockDict.items():
+            g = gradient( stats["mean"] ) if callable( gradient ) else gradient
+            g = np.asarray( g, dtype=float )
+            errors[M] = math.sqrt( max( g.dot( stats["cov"] ).dot( g ), 0.0 ) )
+        return errors
+
     def printScanBlocking(self) :
-        print "M #Blcks  MEAN  VAR  VAR+  VAR-  STD   STD+    STD-"
-        print "---------------------------------------------------"
-        for k, v in self.blockDict.items():
-            print "{M: <2} {length: <4} {mean:.{prec}f} " \
-                  "{var:.{prec}f} {var_plus:.{prec}f} {var_minus:.{prec}f} " \
-                  "{std:.{prec}f} {std_plus:.{prec}f} {std_minus:.{prec}f} ".format(\
-                  M=k, prec=self.prec, **v)
+        super( blockCovariance, self ).printScanBlocking()
+        if not self.blockDict:
+            return
 
-    #-----------------------------#
-    #   Plot Std. Dev. and its    #
-    #   error bars to determine   #
-    #   plateau of blocking       #
-    #-----------------------------#
-    def plotScanBlocking(self):
-        xlist = []
-        xlist = []
-        ylist = []
-        ylisthi = []
-        ylistlo = []
+        plateau = [ M for M in np.ravel( self.plateau() or [] ) if M ]
+        M = max( plateau ) if plateau else max( self.blockDict )
+        labels = self.columnLabels()
+        width  = max( [ len(label) for label in labels ] + [ self.prec + 8 ] )
+        print ""
+        print "Covariance of the mean at M = " + str(M)
+        print " " * width + " ".join( "{0: >{w}}".format( label, w=width ) for label in labels )
+        for label, row in zip( labels, self.blockDict[M]["cov"] ):
+            print "{0: <{w}}".format( label, w=width ) + \
+                  " ".join( "{0: >{w}.{prec}e}".format( value, w=width, prec=self.prec )
+                            for value in row )
 
-        for k, v in self.blockDict.items():
-            xlist.append(k)
-            ylist.append(v["std"])
-            ylisthi.append(v["std_plus"])
-            ylistlo.append(v["std_minus"])
+#----------------------------------------------------------------------#
+#   Jackknife on blocks for nonlinear functions of averages            #
+#     At every level M the sums S_i of the nb blocks of b = 2^M        #
+#     samples (halved from the level below) and their total T give     #
+#     all leave-one-block-out means (T - S_i) / ((nb - 1) b) in one    #
+#     O(nb) array operation. The estimator f maps an (n x k) array of  #
+#     column means to n estimates (or n x q), e.g.                     #
+#       f = lambda m: m[:,1] - m[:,0]**2      (columns E, E^2)         #
+#     and is called once per level on all nb leave-one-out means.      #
+#----------------------------------------------------------------------#
+class blockJackknife( blockFlyvbjergPetersen ):
+    engines = [ "numpy" ]
 
+    def __init__( self, blockingMethod, printPrecision=3, engine="numpy",
+                        labels=None, estimator=None ):
+        super( blockJackknife, self ).__init__( blockingMethod, printPrecision,
+                                                engine, labels )
+        self.estimator = estimator if estimator is not None else ( lambda m: m )
 
-        x = np.asarray(xlist)
-        y = np.asarray(ylist)
-        yhi = np.asarray(ylisthi)
-        ylo = np.asarray(ylistlo)
+    @property
+    def method(self): return "Jackknife on Flyvbjerg & Petersen blocks:" \
+                             "   B. Efron, The Jackknife, the Bootstrap and Other Resampling Plans (1982)"
 
-        ytop = yhi - y
-        ybot = y - ylo
+    def levelStats( self, sums, blockLength ):
+        nb    = len(sums)
+        total = sums.sum( axis=0 )
+        full  = np.asarray( self.estimator( ( total / float( nb * blockLength ) )[np.newaxis] ) )[0]
+        loo   = np.asarray( self.estimator( ( total - sums ) / float( ( nb - 1 ) * blockLength ) ) )
+        looMean  = loo.mean( axis=0 )
+        bias     = ( nb - 1.0 ) * ( looMean - full )
+        variance = ( nb - 1.0 ) / nb * ( ( loo - looMean )**2 ).sum( axis=0 )
 
-        plt.errorbar( x, y, yerr=(ytop,ybot), fmt='-o' )
-        plt.show()
-        return
+        # std. error of the estimate with the error bars of blockStats
+        stats = blockStats( nb, full, variance * ( nb - 1.0 ) )
+        stats["bias"]      = bias
+        stats["corrected"] = full - bias
+        return stats
+
+    def scanBlocking( self, data ):
+        self.blockDict = {}
+
+        sums = np.asarray( data, dtype=float )
+        self.rawStats = None
+        if len(sums) >= 2:
+            self.rawStats = self.levelStats( sums, 1 )
+        M = 0
+        while len(sums) >= 2:
+            M += 1
+            half = len(sums) // 2
+            sums = sums[0:2*half:2] + sums[1:2*half:2]
+            if len(sums) < 2: break
+            self.blockDict[M] = self.levelStats( sums, 2**M )
+
+    def printScanBlocking(self) :
+        labels = self.columnLabels()
+        width  = max( [ len(label) for label in labels or [] ] + [ 8 ] )
+        print self.keyLabel + " #Blcks  {0: <{width}}  ESTIMATE  BIAS  CORRECTED  STD   STD+    STD-".format(\
+              "PROPERTY", width=width)
+        print "-----------" + "-" * width + "---------------------------------------------------"
+        for k, v in sorted( self.blockDict.items() ):
+            for i, label in enumerate( labels or [ "" ] ):
+                column = dict( (key, np.ravel( v[key] )[i]) for key in v if key != "length" )
+                print "{M: <2} {length: <5} {label: <{width}} {mean:.{prec}f} " \
+                      "{bias:.{prec}e} {corrected:.{prec}f} " \
+                      "{std:.{prec}f} {std_plus:.{prec}f} {std_minus:.{prec}f} ".format(\
+                      M=k, length=v["length"], label=label, width=width,
+                      prec=self.prec, **column)
+
+#----------------------------------------------------------------------#
+#   Streaming version of the Flyvbjerg & Petersen method               #
+#     Each blocking level keeps a running count, sum, sum of squares   #
+#     and one pending value waiting for its partner, so samples can    #
+#     be pushed one at a time or in batches with O(log N) memory and   #
+#     the blocking table read out at any moment through blockDict      #
+#----------------------------------------------------------------------#
+class blockFlyvbjergPetersenOnline( blockFlyvbjergPetersen ):
+    def __init__( self, blockingMethod, printPrecision=3, engine="numpy",
+                        labels=None ):
+        super( blockFlyvbjergPetersenOnline, self ).__init__( blockingMethod,
+                                                              printPrecision,
+                                                              engine, labels )
+        self.reset()
+
+    @property
+    def method(self): return "Flyvbjerg & Petersen Method (online):" \
+                             "   J. of Chem. Phys., Vol. 91 (1), 461-466"
+
+    def reset( self ):
+        # sums are accumulated relative to the first sample to
+        # avoid cancellation in (sumsq - sum*sum/n) for large means
+        self.shift   = None
+        self.count   = []
+        self.sum     = []
+        self.sumsq   = []
+        self.pending = []
+        self.lastStep = None
+
+    @property
+    def nsamples( self ):
+        return self.count[0] if self.count else 0
+
+    def addLevel( self ):
+        self.count.append( 0 )
+        self.sum.append( 0.0 )
+        self.sumsq.append( 0.0 )
+        self.pending.append( None )
+
+    # Push a single sample or a batch of samples (along the first axis)
+    def push( self, x ):
+        x = np.asarray( x, dtype=float )
+        if x.ndim == 0:
+            x = x.reshape( 1 )
+        if len(x) == 0:
+            return
+
+        if self.shift is None:
+            self.shift = x[0].copy()
+        x = x - self.shift
+
+        level = 0
+        while len(x):
+            if level == len(self.count):
+                self.addLevel()
+
+            self.count[level] += len(x)
+            self.sum[level]   += x.sum( axis=0 )
+            self.sumsq[level] += ( x * x ).sum( axis=0 )
+
+            if self.pending[level] is not None:
+                x = np.concatenate( ( self.pending[level][np.newaxis], x ) )
+                self.pending[level] = None
+            if len(x) % 2:
+                self.pending[level] = x[-1]
+                x = x[:-1]
+
+            x = ( x[0::2] + x[1::2] ) / 2.0
+            level += 1
+
+    def __call__( self, x ):
+        self.push( x )
+
+    # Push the samples of the next segment (run chunk or restarted log) of
+    # the trajectory. A restarted run prints the step it starts from again,
+    # so a first row with the last step of the previous segment is dropped.
+    def pushSegment( self, x, steps=None ):
+        if steps is not None and len(steps):
+            if self.lastStep is not None and steps[0] == self.lastStep:
+                x = x[1:]
+            self.lastStep = steps[-1]
+        self.push( x )
+
+    #-----------------------------------------------------------#
+    #   Summaries: the state of every level (pending values     #
+    #   included) saved to / loaded from a .npz file. Pushing   #
+    #   the samples of a new segment into a loaded summary      #
+    #   gives the same table as blocking the whole trajectory   #
+    #   in one go, at the cost of the new segment only.         #
+    #-----------------------------------------------------------#
+    def save( self, fileName ):
+        shape = np.shape( self.shift ) if self.shift is not None else ()
+        state = { "count"      : np.array( self.count, dtype=np.int64 ),
+                  "sum"        : np.array( self.sum, dtype=float ).reshape( (-1,) + shape ),
+                  "sumsq"      : np.array( self.sumsq, dtype=float ).reshape( (-1,) + shape ),
+                  "pending"    : np.array( [ p if p is not None else np.zeros( shape )
+                                             for p in self.pending ] ).reshape( (-1,) + shape ),
+                  "hasPending" : np.array( [ p is not None for p in self.pending ], dtype=bool ),
+                  "shift"      : np.zeros( 0 ) if self.shift is None else np.array( self.shift ),
+                  "lastStep"   : np.array( [] if self.lastStep is None else [ self.lastStep ] ),
+                  "labels"     : np.array( list( self.labels or [] ), dtype=str ) }
+        with open( fileName, 'wb' ) as f:
+            np.savez( f, **state )
+
+    def load( self, fileName ):
+        state = np.load( fileName )
+        labels = list( state["labels"] )
+        if labels and self.labels is not None and labels != list( self.labels ):
+            raise Exception( "Blocking summary " + fileName + " is of the properties " \
+                             + ', '.join( labels ) + ", not " + ', '.join( self.labels ) )
+        self.reset()
+        if state["shift"].size:
+            self.shift = state["shift"][()].copy()
+        for M in range( len( state["count"] ) ):
+            self.count.append( int( state["count"][M] ) )
+            self.sum.append( state["sum"][M].copy() )
+            self.sumsq.append( state["sumsq"][M].copy() )
+            self.pending.append( state["pending"][M].copy() if state["hasPending"][M] else None )
+        if len( state["lastStep"] ):
+            self.lastStep = state["lastStep"][0].item()
+        return self
+
+    # Pool the levels of the summary of a later, independently blocked
+    # segment: blocks do not straddle the seam between the two segments and
+    # the values still waiting for a partner at the end of this one are
+    # kept as blocks of their level but will not be paired any more.
+    def combine( self, other ):
+        if other.nsamples == 0:
+            return self
+        if self.nsamples == 0:
+            self.shift = other.shift
+        d = other.shift - self.shift
+        while len(self.count) < len(other.count):
+            self.addLevel()
+        for M in range( len(self.count) ):
+            if M < len(other.count):
+                n = other.count[M]
+                self.count[M] += n
+                self.sum[M]   += other.sum[M] + n * d
+                self.sumsq[M] += other.sumsq[M] + 2.0 * d * other.sum[M] + n * d * d
+                pending = other.pending[M]
+                self.pending[M] = None if pending is None else pending + d
+            else:
+                self.pending[M] = None
+        self.lastStep = other.lastStep
+        return self
+
+    def __add__( self, other ):
+        total = blockFlyvbjergPetersenOnline( self.type, self.prec, self.engine,
+                                              self.labels )
+        return total.combine( self ).combine( other )
+
+    def levelStats( self, M ):
+        n = self.count[M]
+        mean     = self.sum[M] / float( n )
+        variance = ( self.sumsq[M] - self.sum[M] * mean ) / ( n - 1.0 )
+        variance = np.maximum( variance, 0.0 )
+        return blockStats( n, self.shift + mean, variance )
+
+    @property
+    def rawStats( self ):
+        if self.nsamples < 2:
+            return None
+        return self.levelStats( 0 )
+
+    @property
+    def blockDict( self ):
+        blockDict = {}
+        for M in range( 1, len(self.count) ):
+            if self.count[M] < 2: break
+            blockDict[M] = self.levelStats( M )
+        return blockDict
+
+    def scanBlocking( self, data ):
+        self.reset()
+        self.push( data )
 
 #----------------------------------------------------------------------#
 #   Using the standard method by picking # of blocks                   #
+#     Cumulative sums of the (centred) series are built once, after    #
+#     which the means of blocks of any size B are differences of the   #
+#     prefix sums at multiples of B: O(N/B) per size and no copies of  #
+#     the data. By default a log-spaced grid of sizes is scanned.      #
 #----------------------------------------------------------------------#
 class blockSetBlocks( BlockingMethod ):
+    keyLabel = "B"
+
+    def __init__( self, blockingMethod, printPrecision=3, labels=None,
+                        blockSizes=None, nsizes=200 ):
+        super( blockSetBlocks, self ).__init__( blockingMethod,
+                                                printPrecision, labels )
+        self.blockSizes = blockSizes
+        self.nsizes     = nsizes
+
     @property
     def method(self): return "Standard Method:" \
                              "   Explicitly set # of blocks"
 
+    def prefixSums( self, data ):
+        data = np.asarray( data, dtype=float )
+        self.shift = data.mean( axis=0 )
+        sums = np.zeros( (len(data) + 1,) + data.shape[1:] )
+        np.cumsum( data - self.shift, axis=0, out=sums[1:] )
+        return sums
+
+    def blockMeans( self, sums, blockLength, nblocks=None ):
+        if nblocks is None:
+            nblocks = ( len(sums) - 1 ) // blockLength
+        end = nblocks * blockLength
+        return ( sums[blockLength:end+1:blockLength] - sums[0:end:blockLength] ) \
+               / float( blockLength ) + self.shift
+
     def block( self, nblocks, data ):
         blockLength = len(data) / nblocks
-        i=0
-        blockAvgs = []
-        while i < nblocks:  
-            blockData = data[i*blockLength:(i+1)*blockLength]
-            stats = Welford()
-            stats(blockData)
-            blockAvgs.append(stats.mean)
-            i += 1
-        return blockAvgs
+        if blockLength < 1:
+            raise Exception("Cannot split " + str(len(data)) + " samples into " \
+                            + str(nblocks) + " blocks.")
+        return self.blockMeans( self.prefixSums( data ), blockLength, nblocks )
+
+    # log-spaced block sizes from 1 up to N/2 (at least 2 blocks)
+    def defaultBlockSizes( self, N ):
+        if N < 4:
+            return [ 1 ]
+        sizes = np.logspace( 0, math.log10( N // 2 ), self.nsizes )
+        return sorted( set( int(size) for size in sizes ) )
+
+    def scanBlocking( self, data, blockSizes=None ):
+        self.blockDict = {}
+
+        sums = self.prefixSums( data )
+        N    = len(sums) - 1
+        if blockSizes is None:
+            blockSizes = self.blockSizes
+        if blockSizes is None:
+            blockSizes = self.defaultBlockSizes( N )
+
+        for blockLength in blockSizes:
+            if blockLength < 1 or N // blockLength < 2: continue
+            means = self.blockMeans( sums, blockLength )
+            self.blockDict[blockLength] = blockStats( len(means),
+                                                      means.mean( axis=0 ),
+                                                      means.var( axis=0, ddof=1 ) )
+
+#----------------------------------------------------------------------#
+#   Block bootstrap: for every block size B the nb block means are     #
+#   resampled with replacement R times and the spread of the R         #
+#   resampled means gives the standard error and percentile            #
+#   confidence interval of the mean. Replicates are drawn in batches   #
+#   of (replicates x nb) index matrices from seeded RandomStates, one  #
+#   seed per batch, so the result only depends on the seed and not on  #
+#   the number of worker processes the batches are spread over.        #
+#----------------------------------------------------------------------#
+# Means of one batch of resamples of the block means: each row of the
+# (replicates x nb) index matrix is one resample
+def bootstrapBatch( task ):
+    means, replicates, seed = task
+    rng = np.random.RandomState( seed )
+    idx = rng.randint( 0, len(means), size=( replicates, len(means) ) )
+    return means[idx].mean( axis=1 )
+
+class blockBootstrap( blockSetBlocks ):
+    batchElements = 2**22
+
+    def __init__( self, blockingMethod, printPrecision=3, labels=None,
+                        blockSizes=None, replicates=10000, seed=0,
+                        confidence=0.95, workers=None, minBlocks=8,
+                        maxBlocks=2**12 ):
+        super( blockBootstrap, self ).__init__( blockingMethod,
+                                                printPrecision, labels,
+                                                blockSizes )
+        self.replicates = replicates
+        self.seed       = seed
+        self.confidence = confidence
+        self.workers    = workers
+        self.minBlocks  = minBlocks
+        self.maxBlocks  = maxBlocks
+
+    @property
+    def method(self): return "Block Bootstrap Method:" \
+                             "   B. Efron, R. Tibshirani, An Introduction to the Bootstrap (1993)"
+
+    # block sizes 2^M from the first one giving at most maxBlocks blocks
+    # (each replicate draws one index per block, so the cost of a scan is
+    # bounded by replicates x 2 maxBlocks whatever N) while there are at
+    # least minBlocks blocks
+    def defaultBlockSizes( self, N ):
+        sizes = [ 1 ]
+        while N // sizes[-1] > self.maxBlocks:
+            sizes[-1] *= 2
+        while N // ( 2 * sizes[-1] ) >= self.minBlocks:
+            sizes.append( 2 * sizes[-1] )
+        return sizes
+
+    def tasks( self, means, rng ):
+        perBatch = max( 1, self.batchElements // means.size )
+        tasks = []
+        for start in range( 0, self.replicates, perBatch ):
+            replicates = min( perBatch, self.replicates - start )
+            tasks.append( ( means, replicates, rng.randint( 2**31 - 1 ) ) )
+        return tasks
+
+    def resample( self, tasks, pool=None ):
+        if pool is None:
+            return np.concatenate( map( bootstrapBatch, tasks ) )
+        return np.concatenate( pool.map( bootstrapBatch, tasks ) )
+
+    def scanBlocking( self, data, blockSizes=None ):
+        self.blockDict = {}
+        if self.replicates < 2:
+            raise Exception("Bootstrap needs at least 2 replicates.")
 
+        sums = self.prefixSums( data )
+        N    = len(sums) - 1
+        if blockSizes is None:
+            blockSizes = self.blockSizes
+        if blockSizes is None:
+            blockSizes = self.defaultBlockSizes( N )
+
+        rng  = np.random.RandomState( self.seed )
+        tail = 50.0 * ( 1.0 - self.confidence )
+        pool = None
+        if self.workers is not None and self.workers > 1:
+            pool = multiprocessing.Pool( self.workers )
+        try:
+            for blockLength in blockSizes:
+                if blockLength < 1 or N // blockLength < 2: continue
+                means = self.blockMeans( sums, blockLength )
+                boot  = self.resample( self.tasks( means, rng ), pool )
+
+                stats = blockStats( len(means), means.mean( axis=0 ),
+                                    means.var( axis=0, ddof=1 ) )
+                # std (+/-) of the bootstrap standard error, error bars
+                # relative as for the analytic estimate
+                std = boot.std( axis=0, ddof=1 )
+                relative = 1.0 / math.sqrt( 2.0 * ( len(means) - 1.0 ) )
+                stats.update( { "var"       : std**2,
+                                "var_plus"  : std**2 * ( 1.0 + 2.0 * relative ),
+                                "var_minus" : std**2 * ( 1.0 - 2.0 * relative ),
+                                "std"       : std,
+                                "std_plus"  : std * ( 1.0 + relative ),
+                                "std_minus" : std * ( 1.0 - relative ),
+                                "ci_low"    : np.percentile( boot, tail, axis=0 ),
+                                "ci_high"   : np.percentile( boot, 100.0 - tail, axis=0 ) } )
+                self.blockDict[blockLength] = stats
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+
+    def printScanBlocking(self) :
+        labels = self.columnLabels()
+        width  = max( [ len(label) for label in labels or [] ] + [ 8 ] )
+        ci     = "CI{0:g}%".format( 100.0 * self.confidence )
+        print self.keyLabel + " #Blcks  {0: <{width}}  MEAN  STD   STD+    STD-  {1}_LOW  {1}_HIGH".format(\
+              "PROPERTY", ci, width=width)
+        print "-----------" + "-" * width + "---------------------------------------------------"
+        for k, v in sorted( self.blockDict.items() ):
+            for i, label in enumerate( labels or [ "" ] ):
+                column = dict( (key, np.ravel( v[key] )[i]) for key in v if key != "length" )
+                print "{M: <2} {length: <5} {label: <{width}} {mean:.{prec}f} " \
+                      "{std:.{prec}f} {std_plus:.{prec}f} {std_minus:.{prec}f} " \
+                      "{ci_low:.{prec}f} {ci_high:.{prec}f} ".format(\
+                      M=k, length=v["length"], label=label, width=width,
+                      prec=self.prec, **column)
+
+#----------------------------------------------------------------------#
+#   Integrated autocorrelation time from the normalized                #
+#   autocorrelation function, computed by FFT in O(N log N), with      #
+#   the automatic windowing of Sokal ("Monte Carlo Methods in          #
+#   Statistical Mechanics", 1996): the sum over lags is cut at the     #
+#   first window W with W >= c * g(W). Columns of a 2-D (samples x     #
+#   properties) array are all transformed at once.                     #
+#----------------------------------------------------------------------#
+class blockAutocorrelation( BlockingMethod ):
+    def __init__( self, blockingMethod, printPrecision=3, labels=None,
+                        window=5.0 ):
+        super( blockAutocorrelation, self ).__init__( blockingMethod,
+                                                      printPrecision, labels )
+        self.c = window
+
+    @property
+    def method(self): return "Autocorrelation Method:" \
+                             "   A. Sokal, Monte Carlo Methods in Statistical Mechanics (1996)"
+
+    # rho(t) for t = 0 ... N-1 along the first axis. A constant column
+    # (zero variance) is uncorrelated: rho(0) = 1, rho(t > 0) = 0, so
+    # g = 1 and its std. error is 0 as with the blocking methods
+    def autocorrelation( self, data ):
+        N    = len(data)
+        x    = data - data.mean( axis=0 )
+        nfft = 2**int( math.ceil( math.log( 2*N, 2 ) ) )
+        f    = np.fft.rfft( x, n=nfft, axis=0 )
+        acf  = np.fft.irfft( f * np.conjugate(f), n=nfft, axis=0 )[:N]
+        constant = acf[0] <= 0.0
+        rho = acf / np.where( constant, 1.0, acf[0] )
+        rho[0] = np.where( constant, 1.0, rho[0] )
+        return rho
+
+    def scanBlocking( self, data ):
+        data = np.asarray( data, dtype=float )
+        N = len(data)
+        if N < 2:
+            raise Exception("Autocorrelation method needs at least 2 samples.")
+
+        self.acf = self.autocorrelation( data )
+
+        # statistical inefficiency g(W) = 1 + 2 sum_{t=1}^{W} rho(t)
+        g = 2.0 * np.cumsum( self.acf, axis=0 ) - 1.0
+        lags   = np.arange( N ).reshape( (N,) + (1,) * (data.ndim-1) )
+        with np.errstate( invalid='ignore' ):
+            inside = lags < self.c * g
+        window = np.where( inside.all( axis=0 ), N-1, np.argmin( inside, axis=0 ) )
+
+        if data.ndim == 1:
+            g = g[ window ]
+        else:
+            g = g[ window, np.arange( data.shape[1] ) ]
+        g   = np.maximum( g, 1.0 )
+        var = data.var( axis=0, ddof=1 )
+
+        self.results = { "length"  : N,
+                         "mean"    : data.mean( axis=0 ),
+                         "var"     : var,
+                         "window"  : window,
+                         "tau_int" : g / 2.0,
+                         "g"       : g,
+                         "n_eff"   : N / g,
+                         "std"     : np.sqrt( var * g / N ) }
+
+    def printScanBlocking(self) :
+        r = self.results
+        ncols = np.size( r["mean"] )
+        labels = self.labels if self.labels is not None else \
+                 ( [""] if np.ndim( r["mean"] ) == 0 else [ str(i) for i in range(ncols) ] )
+        width = max( [ len(label) for label in labels ] + [ 8 ] )
+
+        print "{0: <{width}} N      MEAN  VAR  TAU_INT  G  WINDOW  N_EFF  STD_ERR".format(\
+              "PROPERTY", width=width)
+        print "-" * ( width + 58 )
+        for i, label in enumerate( labels ):
+            column = dict( (key, np.ravel( r[key] )[i]) for key in r if key != "length" )
+            print "{label: <{width}} {length: <6} {mean:.{prec}f} {var:.{prec}f} " \
+                  "{tau_int:.{prec}f} {g:.{prec}f} {window: <4} {n_eff:.1f} " \
+                  "{std:.{prec}f}".format(\
+                  label=label, width=width, length=r["length"], prec=self.prec, **column)
+
+    #-----------------------------#
+    #   Plot normalized ACF and   #
+    #   the automatic window      #
+    #-----------------------------#
+    def plotScanBlocking(self, fileName=None):
+        plt = pyplot()
+        acf = self.acf.reshape( len(self.acf), -1 )
+        window = np.ravel( self.results["window"] )
+        lagMax = min( len(acf), 4 * int( window.max() ) + 1 )
+        labels = self.labels if self.labels is not None else \
+                 [ str(i) for i in range( acf.shape[1] ) ]
+
+        for i in range( acf.shape[1] ):
+            line, = plt.plot( np.arange( lagMax ), acf[:lagMax,i], label=labels[i] )
+            plt.axvline( window[i], color=line.get_color(), linestyle='--' )
+        plt.xlabel( "lag" )
+        plt.ylabel( "normalized autocorrelation" )
+        if acf.shape[1] > 1 or self.labels is not None:
+            plt.legend()
+        showPlot( plt, fileName )
+        return
@@ -0,0 +1,214 @@
+import os, json, re
+import hashlib
+import shutil
+import numpy as np
+from collections import OrderedDict
+
+from parserIO import allColumns
+import profiling
+
+#---------------------------------------------------------------------------------#
+#   One .npy file per column per data chunk, written atomically (temporary file   #
+#   + rename) so readers never see a partial file. Shared with the column store.  #
+#---------------------------------------------------------------------------------#
+def columnFile(chunk, column):
+    return str(chunk) + '_' + re.sub(r'[^\w.-]', '_', column) + '.npy'
+
+def saveColumn(path, values, dtype=None):
+    tmp = path + '.' + str(os.getpid())
+    with open( tmp, 'wb' ) as f:
+        np.save( f, np.asarray( values, dtype=dtype ) )
+    os.rename( tmp, path )
+
+def saveJSON(path, content):
+    tmp = path + '.' + str(os.getpid())
+    with open( tmp, 'w' ) as f:
+        json.dump( content, f, indent=1, sort_keys=True )
+    os.rename( tmp, path )
+
+#---------------------------------------------------------------------------------#
+#   Persistent Columnar Parse Cache                                               #
+#---------------------------------------------------------------------------------#
+class ParseCache(object):
+    """ On-disk cache of the columns parsed by a FileType reader, so repeat
+    analyses of the same (large) file skip the text parsing altogether.
+
+    Every (file path, size, mtime, parser type) gets its own directory
+    holding one .npy file per column per data chunk plus a manifest.json.
+    Columns are loaded back memory mapped and only the columns that are
+    not in the cache yet are parsed. Least recently used entries are
+    evicted once the cache grows beyond maxBytes.
+
+    Usage:
+        >>> cache = ParseCache()
+        >>> f = io.selectFileType('LAMMPS_Log')
+        >>> data = cache.readData( f, 'log.lammps', { 'PotEng' : float } )
+    """
+    manifestName = 'manifest.json'
+
+    def __init__(self, cacheDir=None, maxBytes=2*1024**3,
+                       enabled=True, rebuild=False):
+        if cacheDir is None:
+            cacheDir = os.environ.get('LMPS_BLOCKING_CACHE',
+                           os.path.join( os.path.expanduser('~'),
+                                         '.cache', 'lmps_blocking' ) )
+        self.cacheDir = cacheDir
+        self.maxBytes = maxBytes
+        self.enabled  = enabled
+        self.rebuild  = rebuild
+
+    #--- cache keys and layout ---#
+
+    def stamp(self, reader, fileName):
+        stat = os.stat( fileName )
+        return { 'file'   : os.path.abspath( fileName ),
+                 'size'   : stat.st_size,
+                 'mtime'  : stat.st_mtime,
+                 'parser' : reader.__class__.__name__ }
+
+    def entryDir(self, stamp):
+        key = json.dumps( stamp, sort_keys=True )
+        return os.path.join( self.cacheDir, hashlib.sha1(key).hexdigest() )
+
+    columnFile = staticmethod( columnFile )
+
+    # A cached column serves requests of the same kind and equal or lower
+    # precision (e.g. float64 on disk for a float32 request), not higher
+    @staticmethod
+    def covers(cached, requested):
+        if cached is None:
+            return False
+        cached, requested = np.dtype( cached ), np.dtype( requested )
+        return cached.kind == requested.kind and \
+               cached.itemsize >= requested.itemsize
+
+    def cacheable(self, ycol):
+        if ycol == allColumns:
+            return self.enabled
+        return self.enabled and ycol and \
+               all( np.dtype(ycol[k]).kind in 'biuf' for k in ycol )
+
+    #--- manifest ---#
+
+    def loadManifest(self, entry, stamp):
+        path = os.path.join( entry, self.manifestName )
+        if self.rebuild or not os.path.exists( path ):
+            return None
+        with open( path, 'r' ) as f:
+            manifest = json.load( f )
+        if manifest.get('stamp') != stamp:
+            return None
+        return manifest
+
+    def writeManifest(self, entry, manifest):
+        saveJSON( os.path.join( entry, self.manifestName ), manifest )
+
+    #--- read through the cache ---#
+
+    # chunks / steps select log chunks (see LAMMPSLog.data): served from a
+    # complete cache entry when there is one, otherwise only the selected
+    # chunks are parsed and nothing is stored
+    def readData(self, reader, fileName, ycol, chunks=None, steps=None):
+        selection = dict()
+        if chunks is not None or steps is not None:
+            selection = dict( chunks=chunks, steps=steps )
+
+        if not reader.cacheable or not self.cacheable( ycol ):
+            return reader.readData( fileName, None, ycol, **selection )
+
+        stamp = self.stamp( reader, fileName )
+        entry = self.entryDir( stamp )
+        if self.rebuild and os.path.isdir( entry ):
+            shutil.rmtree( entry )
+
+        manifest = self.loadManifest( entry, stamp )
+        if manifest is None:
+            manifest = { 'stamp'   : stamp, 'chunks' : None,
+                         'columns' : {},    'all'    : None }
+
+        if ycol == allColumns:
+            missing = allColumns if manifest.get('all') is None else None
+        else:
+            missing = OrderedDict( (k, ycol[k]) for k in ycol
+                                   if not self.covers( manifest['columns'].get(k),
+                                                       ycol[k] ) )
+        if missing and selection:
+            return reader.readData( fileName, None, ycol, **selection )
+        if missing:
+            self.store( reader, fileName, missing, entry, manifest )
+        else:
+            os.utime( os.path.join( entry, self.manifestName ), None )
+
+        keys = manifest['chunks']
+        if selection:
+            keys = [ key for key in reader.selectChunks( fileName, **selection )
+                     if key in keys ]
+
+        data = dict()
+        with profiling.getProfiler().phase( 'cache.load' ) as phase:
+            for chunk in keys:
+                if ycol == allColumns:
+                    columns = OrderedDict( (column, float) for column
+                                           in manifest['all'][str(chunk)] )
+                else:
+                    columns = ycol
+
+                data[chunk] = OrderedDict()
+                for column in columns:
+                    path  = os.path.join( entry, self.columnFile(chunk, column) )
+                    array = np.load( path, mmap_mode='r' )
+                    if array.dtype != np.dtype( columns[column] ):
+                        array = array.astype( columns[column] )
+                    data[chunk][column] = array
+                    phase.add( bytes=array.nbytes, rows=len(array) )
+        return data
+
+    def store(self, reader, fileName, ycol, entry, manifest):
+        data = reader.readData( fileName, None, ycol )
+
+        if not os.path.isdir( entry ):
+            os.makedirs( entry )
+        for chunk in data:
+            for column in data[chunk]:
+                dtype = float if ycol == allColumns else ycol[column]
+                saveColumn( os.path.join( entry, self.columnFile(chunk, column) ),
+                            data[chunk][column], dtype )
+
+        manifest['chunks'] = sorted( data.keys() )
+        if ycol == allColumns:
+            manifest['all'] = dict( (str(chunk), list(data[chunk]))
+                                    for chunk in data )
+            common = set.intersection( *[ set(data[chunk]) for chunk in data ] ) \
+                     if data else set()
+            ycol = dict( (column, float) for column in common )
+        for column in ycol:
+            manifest['columns'][column] = np.dtype( ycol[column] ).str
+        self.writeManifest( entry, manifest )
+        self.evict( keep=entry )
+
+    #--- size bounded eviction, least recently used first ---#
+
+    @staticmethod
+    def entrySize(entry):
+        return sum( os.path.getsize( os.path.join(entry, name) )
+                    for name in os.listdir( entry ) )
+
+    def evict(self, keep=None):
+        entries = []
+        for name in os.listdir( self.cacheDir ):
+            entry    = os.path.join( self.cacheDir, name )
+            manifest = os.path.join( entry, self.manifestName )
+            if not os.path.exists( manifest ): continue
+            entries.append( ( os.path.getmtime(manifest), entry,
+                              self.entrySize(entry) ) )
+
+        total = sum( size for mtime, entry, size in entries )
+        for mtime, entry, size in sorted( entries ):
+            if total <= self.maxBytes: break
+            if entry == keep: continue
+            shutil.rmtree( entry, ignore_errors=True )
+            total -= size
+
+    def clear(self):
+        if os.path.isdir( self.cacheDir ):
+            shutil.rmtree( self.cacheDir )
@@ -0,0 +1,146 @@
+import os, json
+import numpy as np
+from collections import OrderedDict
+
+import parserIO as io
+from cache import columnFile, saveColumn, saveJSON
+
+#---------------------------------------------------------------------------------#
+#   Binary Columnar Store                                                         #
+#     A directory with one .npy file per column per data chunk and a manifest of  #
+#     the columns, dtypes, row counts and timestep range of every chunk, written  #
+#     once from any reader by convert() (block.convert.py) and read back memory   #
+#     mapped by ColumnStore, so analyses start without any parsing               #
+#---------------------------------------------------------------------------------#
+storeFormat  = 'lmps_blocking column store'
+manifestName = 'manifest.json'
+
+# First and last timestep of a data chunk: the Step column of a log chunk,
+# the timestep key of a dump frame
+def stepRange( reader, key, columns ):
+    if 'Step' in columns and len( columns['Step'] ):
+        return [ int( columns['Step'][0] ), int( columns['Step'][-1] ) ]
+    if isinstance( reader, io.LAMMPSDumpIndexed ):
+        return [ int(key), int(key) ]
+    return None
+
+# Timestep columns and other float columns holding only integers are stored
+# as int64 whatever dtype the floats are stored in (float32 rounds steps
+# beyond 2^24)
+def integerValued( values ):
+    return values.dtype.kind == 'f' and len( values ) and \
+           np.all( np.isfinite( values ) ) and np.all( values == np.round( values ) ) and \
+           np.all( np.abs( values ) < 2**63 )
+
+def convert( reader, fileName, storeDir, ycol=io.allColumns, xcol=None, dtype=None ):
+    data = reader.readData( fileName, xcol, ycol )
+    if not os.path.isdir( storeDir ):
+        os.makedirs( storeDir )
+    removeStore( storeDir )
+
+    chunks = []
+    for key in sorted( data ):
+        if not isinstance( data[key], dict ):
+            raise Exception( reader.__class__.__name__ + " does not return data " \
+                             "columns, it cannot be converted to a column store." )
+        columns = OrderedDict()
+        rows    = 0
+        for column, values in data[key].items():
+            values = np.asarray( values )
+            if integerValued( values ):
+                values = values.astype( np.int64 )
+            elif dtype is not None and values.dtype.kind == 'f':
+                values = values.astype( dtype )
+            saveColumn( os.path.join( storeDir, columnFile(key, column) ), values )
+            columns[column] = values.dtype.str
+            rows = max( rows, len(values) )
+
+        chunks.append( OrderedDict( [
+            ( "key",     int(key) ),
+            ( "header",  list( columns ) ),
+            ( "columns", columns ),
+            ( "rows",    rows ),
+            ( "steps",   stepRange( reader, key, data[key] ) ) ] ) )
+
+    stat = os.stat( fileName )
+    manifest = OrderedDict( [
+        ( "format",  storeFormat ),
+        ( "version", 1 ),
+        ( "source",  OrderedDict( [ ( "file",   os.path.abspath( fileName ) ),
+                                    ( "size",   stat.st_size ),
+                                    ( "mtime",  stat.st_mtime ),
+                                    ( "parser", reader.__class__.__name__ ) ] ) ),
+        ( "chunks",  chunks ) ] )
+    saveJSON( os.path.join( storeDir, manifestName ), manifest )
+    return manifest
+
+def loadManifest( storeDir ):
+    path = os.path.join( storeDir, manifestName )
+    if not os.path.exists( path ):
+        return None
+    with open( path, 'r' ) as f:
+        manifest = json.load( f, object_pairs_hook=OrderedDict )
+    if manifest.get( "format" ) != storeFormat:
+        raise Exception( path + " is not a column store manifest." )
+    return manifest
+
+# Columns of a previous conversion into the same directory
+def removeStore( storeDir ):
+    manifest = loadManifest( storeDir )
+    if manifest is None:
+        return
+    os.remove( os.path.join( storeDir, manifestName ) )
+    for chunk in manifest["chunks"]:
+        for column in chunk["columns"]:
+            path = os.path.join( storeDir, columnFile( chunk["key"], column ) )
+            if os.path.exists( path ):
+                os.remove( path )
+
+#---------------------------------------------------------------------------------#
+#   Column Store File Type - fileName is the store directory (or its manifest)    #
+#---------------------------------------------------------------------------------#
+class ColumnStore(io.FileType):
+    cacheable = False
+
+    @property
+    def format(self):
+        descript = ("Binary column store - one memory mapped .npy file per column "
+                    "per data chunk, written by block.convert.py")
+        return descript
+
+    def storeDir(self):
+        if os.path.basename( self.fileName ) == manifestName:
+            return os.path.dirname( self.fileName )
+        return self.fileName
+
+    def data(self, xcol=None, ycol=None):
+        storeDir = self.storeDir()
+        manifest = loadManifest( storeDir )
+        if manifest is None:
+            raise Exception( "No column store manifest found in " + storeDir )
+
+        data = dict()
+        for chunk in manifest["chunks"]:
+            if ycol == io.allColumns:
+                columns = OrderedDict( (column, None) for column in chunk["header"] )
+                if xcol: columns.update( xcol )
+            else:
+                columns = OrderedDict()
+                for col in ( xcol, ycol ):
+                    if col: columns.update( col )
+
+            missing = [ column for column in columns if column not in chunk["columns"] ]
+            if missing:
+                raise Exception( "ERROR: One of the following column headers: " \
+                                  + str(set(missing)) + " was NOT Found in " \
+                                  + storeDir + " column store.\n Header list: " \
+                                  + ' '.join( chunk["header"] ) )
+
+            data[chunk["key"]] = OrderedDict()
+            for column, convertType in columns.items():
+                path   = os.path.join( storeDir, columnFile( chunk["key"], column ) )
+                values = np.load( path, mmap_mode='r' )
+                if convertType is not None and values.dtype != np.dtype( convertType ):
+                    values = values.astype( convertType )
+                data[chunk["key"]][column] = values
+        return data
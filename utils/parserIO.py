@@ -1,5 +1,32 @@
 
 import re
+import os
+import io
+import mmap
+import gzip
+import bz2
+import subprocess
+import itertools
+import importlib
+import warnings
+import array
+import ctypes
+import multiprocessing
+import numpy as np
+from collections import OrderedDict, namedtuple
+
+import profiling
+
+try:
+    import lzma
+except ImportError:
+    try:
+        from backports import lzma
+    except ImportError:
+        lzma = None
+
+# Pass as ycol to read every numeric column of each data chunk
+allColumns = 'all'
 
 
 def setTypes( data ):
@@ -28,60 +55,256 @@ class FileClass( object ):
 
 
 #---------------------------------------------------------------------------------#
+#   Registry of file formats: every format name maps to its reader class as       #
+#   "Class" (in this module) or "module:Class" (a module of this package), only   #
+#   resolved / imported once that format is selected                              #
+#---------------------------------------------------------------------------------#
+fileTypes = OrderedDict()
+
+def registerFileType( names, reader ):
+    for name in names:
+        fileTypes[name] = reader
+
+def resolveReader( reader ):
+    if ':' not in reader:
+        return globals()[reader]
+    module, name = reader.split(':')
+    package = __name__.rpartition('.')[0]
+    if package:
+        module = importlib.import_module( '.' + module, package )
+    else:
+        module = importlib.import_module( module )
+    return getattr( module, name )
+
+registerFileType( ['LAMMPS_pairCoeff', 'lammps_pairCoeff', 
+                   'LAMMPSpairCoeff', 'lammpspairCoeff', 
+                   'lmpspairCoeff', 'lmps_pairCoeff',
+                   'lmp_pairCoeff', 'lmppairCoeff' ],         'LAMMPSPairCoeff' )
+registerFileType( ['LAMMPS_Log', 'lammps_Log', 'LAMMPSLog', 'lammpsLog', \
+                   'log.lammps', 'log' ],                     'LAMMPSLog' )
+registerFileType( ['LAMMPS_Dump', 'lammps_Dump', 'LAMMPSDump', 'lammpsDump', \
+                   'dump' ],                                  'LAMMPSDump' )
+registerFileType( ['LAMMPS_DumpParallel', 'lammps_DumpParallel', \
+                   'LAMMPSDumpParallel', 'lammpsDumpParallel', 'dumpParallel' ],
+                                                              'LAMMPSDumpParallel' )
+registerFileType( ['LAMMPS_DumpBox', 'lammps_DumpBox', 'LAMMPSDumpBox', \
+                   'lammpsDumpBox',  'dumpBox' ],             'LAMMPSDumpBoxBounds' )
+registerFileType( ['LAMMPS_DumpAtoms', 'lammps_DumpAtoms', \
+                   'LAMMPSDumpAtoms',  'lammpsDumpAtoms',  'dumpAtoms' ],
+                                                              'LAMMPSDumpAtomsBounds' )
+registerFileType( ['LAMMPS_compute', 'lammps_compute',
+                   'LAMMPSCompute', 'lammpsCompute', 'lmps_compute' ],
+                                                              'LAMMPSCompute' )
+registerFileType( [ 'xyz', 'XYZ', 'xyzFile', 'XYZFile' ],     'XYZ' )
+registerFileType( ['Widom', 'ChemPot', 'MyWidom', 'MyChemPot', \
+                   'WidomChemPot', 'MyWidomChemPot' ],        'ChemicalPot' )
+registerFileType( ['ColumnStore', 'columnStore', 'column_store', 'store', 'npy' ],
+                                                              'columnstore:ColumnStore' )
+registerFileType( [ 'columns', 'simple', 'Simple', 'Columns' ], 'SimpleColumns' )
+
 def selectFileType( fileType ):
+    if fileType not in fileTypes:
+        raise Exception('File format "' + fileType + '" is not supported.')
+    return resolveReader( fileTypes[fileType] )( fileType )
 
-    lmpsPairCoeffNames= ['LAMMPS_pairCoeff', 'lammps_pairCoeff', 
-                         'LAMMPSpairCoeff', 'lammpspairCoeff', 
-                         'lmpspairCoeff', 'lmps_pairCoeff'
-                         'LAMMPS_pairCoeff', 'lammps_pairCoeff', 
-                         'LAMMPSpairCoeff', 'lammpspairCoeff', 
-                         'lmp_pairCoeff', 'lmppairCoeff' ]
-    lmpsLogNames  = ['LAMMPS_Log', 'lammps_Log', 'LAMMPSLog', 'lammpsLog', \
-                      'log.lammps', 'log' ]
-    lmpsDumpNames = ['LAMMPS_Dump', 'lammps_Dump', 'LAMMPSDump', 'lammpsDump', \
-                     'dump' ]
-    lmpsDumpBox   = ['LAMMPS_DumpBox', 'lammps_DumpBox', 'LAMMPSDumpBox', \
-                     'lammpsDumpBox',  'dumpBox' ]
-    lmpsDumpAtoms   = ['LAMMPS_DumpAtoms', 'lammps_DumpAtoms', \
-                       'LAMMPSDumpAtoms',  'lammpsDumpAtoms',  'dumpAtoms' ]
-    lmpsComputeNames  = ['LAMMPS_compute', 'lammps_compute',
-                         'LAMMPSCompute', 'lammpsCompute',
-                         'lammps_compute', 'lmps_compute'   ]
-    xyzFileNames  = [ 'xyz', 'XYZ', 'xyzFile', 'XYZFile' ]
-    customChemPot = ['Widom', 'ChemPot', 'MyWidom', 'MyChemPot', \
-                     'WidomChemPot', 'MyWidomChemPot' ]
-    simpleNames   = [ 'columns', 'simple', 'Simple', 'Columns' ]
- 
-    if      fileType in lmpsPairCoeffNames: return LAMMPSPairCoeff(fileType)
+#---------------------------------------------------------------------------------#
+#   Compressed files: gzip, bzip2 and xz are recognised by their magic bytes      #
+#   (whatever the file extension) and decompressed while streaming, so no         #
+#   decompressed copy is written to disk or held in memory                        #
+#---------------------------------------------------------------------------------#
+magicNumbers = [ ( '\x1f\x8b',       'gzip' ),
+                 ( 'BZh',            'bz2'  ),
+                 ( '\xfd7zXZ\x00',   'xz'   ) ]
 
-    elif    fileType in lmpsLogNames:     return LAMMPSLog(fileType)
+def compression( fileName ):
+    with open( fileName, 'rb' ) as f:
+        head = f.read( 6 )
+    for magic, kind in magicNumbers:
+        if head.startswith( magic ):
+            return kind
+    return None
 
-    elif    fileType in lmpsDumpNames:    return LAMMPSDump(fileType)
+def openFile( fileName, bufferSize=2**20 ):
+    kind = compression( fileName )
+    if kind is None:
+        return open( fileName, 'r' )
+    if kind == 'gzip':
+        return io.BufferedReader( gzip.open( fileName, 'rb' ), bufferSize )
+    if kind == 'bz2':
+        return bz2.BZ2File( fileName, 'r', bufferSize )
+    if lzma is not None:
+        return io.BufferedReader( lzma.open( fileName, 'rb' ), bufferSize )
+    return DecompressPipe( [ 'xz', '-dc', fileName ], bufferSize )
 
-    elif    fileType in lmpsDumpBox:      return  LAMMPSDumpBoxBounds(FileType)
+# Decompressed output of an external tool (xz on Python 2 without lzma)
+class DecompressPipe(object):
+    def __init__(self, command, bufferSize=2**20):
+        try:
+            self.process = subprocess.Popen( command, stdout=subprocess.PIPE,
+                                             bufsize=bufferSize )
+        except OSError:
+            raise Exception( "Reading " + command[-1] + " needs the lzma module " \
+                             "or the '" + command[0] + "' program." )
+        self.stdout = self.process.stdout
 
-    elif    fileType in lmpsDumpAtoms:      return  LAMMPSDumpAtomsBounds(FileType)
+    def __iter__(self):
+        return iter( self.stdout )
 
-    elif    fileType in lmpsComputeNames: return  LAMMPSCompute(FileType)
+    def read(self, size=-1):
+        return self.stdout.read( size )
 
-    elif    fileType in xyzFileNames:     return XYZ(fileType)
+    def readline(self):
+        return self.stdout.readline()
 
-    elif    fileType in customChemPot:    return ChemicalPot(fileType)
+    def close(self):
+        self.stdout.close()
+        self.process.wait()
 
-    elif    fileType in simpleNames:      return SimpleColumns(fileType) 
+    def __enter__(self):
+        return self
 
-    else:
-        raise Exception('File format "' + fileType + '" is not supported.')
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+# Byte ranges (sections[start:end]) of a compressed file, decompressed
+# while reading forwards: sections are cheapest read in file order
+class StreamSections(object):
+    def __init__(self, fileName):
+        self.fileName = fileName
+        self.f   = openFile( fileName )
+        self.pos = 0
+
+    def seek(self, pos):
+        if pos < self.pos:
+            self.f.close()
+            self.f, self.pos = openFile( self.fileName ), 0
+        while self.pos < pos:
+            skipped = self.f.read( min( pos - self.pos, 2**20 ) )
+            if not skipped: break
+            self.pos += len( skipped )
+
+    def lines(self, start, end):
+        self.seek( start )
+        while self.pos < end:
+            line = self.f.readline()
+            if not line: return
+            self.pos += len( line )
+            if self.pos > end:
+                line = line[ : len(line) - ( self.pos - end ) ]
+            yield line
+
+    def __getitem__(self, byteRange):
+        self.seek( byteRange.start )
+        section = self.f.read( byteRange.stop - byteRange.start )
+        self.pos += len( section )
+        return section
+
+    def close(self):
+        self.f.close()
+
+# The mmap interface used by the indexes (size, find, rfind, slicing) and
+# line reads of byte ranges over plain reads of a file: the pages of a mapped
+# file count in the resident memory of the process once touched, pages read
+# into blocks only while the block is alive
+class BlockFile(object):
+    blockSize = 2**24
+
+    def __init__(self, fileName):
+        self.f      = open( fileName, 'rb' )
+        self.length = os.fstat( self.f.fileno() ).st_size
+
+    def size(self):
+        return self.length
+
+    def __getitem__(self, byteRange):
+        start = byteRange.start or 0
+        stop  = self.length if byteRange.stop is None else min( byteRange.stop, self.length )
+        if stop <= start:
+            return ''
+        self.f.seek( start )
+        return self.f.read( stop - start )
+
+    def find(self, sub, start=0, end=None):
+        end = self.length if end is None else min( end, self.length )
+        pos = start
+        while pos < end:
+            hi    = min( pos + self.blockSize, end )
+            found = self[ pos : min( hi + len(sub) - 1, end ) ].find( sub )
+            if found >= 0:
+                return pos + found
+            pos = hi
+        return -1
+
+    def rfind(self, sub, start=0, end=None):
+        end = self.length if end is None else min( end, self.length )
+        hi  = end
+        while hi > start:
+            lo    = max( hi - self.blockSize, start )
+            found = self[ lo : min( hi + len(sub) - 1, end ) ].rfind( sub )
+            if found >= 0:
+                return lo + found
+            hi = lo
+        return -1
+
+    # Lines of the byte range [start, end), read one at a time so the
+    # section is never copied as a whole
+    def lines(self, start, end):
+        self.f.seek( start )
+        pos = start
+        for line in self.f:
+            pos += len( line )
+            if pos >= end:
+                yield line[ : len(line) - ( pos - end ) ]
+                return
+            yield line
+
+    def close(self):
+        self.f.close()
+
+#---------------------------------------------------------------------------------#
+#   Parent class of the section indexes of a file (log chunks, dump frames):      #
+#   tied to the file size + mtime and read back through mmap (plain files) or     #
+#   forward streaming sections (compressed files)                                 #
+#---------------------------------------------------------------------------------#
+class FileIndex(object):
+    @staticmethod
+    def fileStamp( fileName ):
+        stat = os.stat( fileName )
+        return ( os.path.abspath(fileName), stat.st_size, stat.st_mtime )
+
+    def isCurrent( self, fileName ):
+        return self.stamp == self.fileStamp( fileName )
+
+    def open( self ):
+        return self.openSections( self.fileName )
+
+    # Same sections without mapping the file
+    @staticmethod
+    def openBlocks( fileName ):
+        if compression( fileName ):
+            return StreamSections( fileName )
+        return BlockFile( fileName )
+
+    @staticmethod
+    def openSections( fileName ):
+        if compression( fileName ):
+            return StreamSections( fileName )
+        with open( fileName, 'rb' ) as f:
+            return mmap.mmap( f.fileno(), 0, access=mmap.ACCESS_READ )
 
 #---------------------------------------------------------------------------------#
 #   Parent File Type Class - Inherited by all others and calls other classes      #
 #---------------------------------------------------------------------------------#
 class FileType(object):
+    # text formats are worth keeping in the parse cache (utils/cache.py)
+    cacheable = True
+
     def __init__(self, fileType):
         self.fileType = fileType
 
     def readData(self, fileName=None, xcol=None, ycol=None, \
-                       section=None,  key=None):
+                       section=None,  key=None, **kwargs):
         if not fileName:
             raise Exception("Must pass in filename for readData(...).")
 
@@ -92,13 +315,12 @@ class FileType(object):
                             "at the very least to readData(...)." )
         '''
 
-        print xcol
         if xcol and not isinstance(xcol, dict):
             raise Exception("In readData(...), xcol must be " \
                             "dictionaries w/ column string as key and "\
                             "data type as value.")
 
-        if ycol and not isinstance(ycol,dict):
+        if ycol and not isinstance(ycol,dict) and ycol != allColumns:
             raise Exception("In readData(...), ycol must be " \
                             "dictionaries w/ column string as key and "\
                             "data type as value.")
@@ -110,7 +332,8 @@ class FileType(object):
                             "Exception was raised due to value not being " \
                             "data type.")
 
-        if ycol and not all( isinstance(type(ycol[k]),type) for k in ycol):
+        if ycol and ycol != allColumns and \
+                not all( isinstance(type(ycol[k]),type) for k in ycol):
             raise Exception("In readData(...), ycol is a " \
                             "dictionary but you must have the "\
                             "column string as key and data type as value. "\
@@ -122,7 +345,10 @@ class FileType(object):
                             "and key in the dictionary." )
 
         self.fileName  = fileName
-        data = self.data( xcol, ycol )
+        with profiling.getProfiler().phase( 'read' ) as phase:
+            if phase.enabled:
+                phase.add( bytes=os.path.getsize( fileName ) )
+            data = self.data( xcol, ycol, **kwargs )
         if section and key:
             data = getListFor( data, section, key )
         return data
@@ -140,13 +366,33 @@ class FileType(object):
     @property
     def file_obj(self): 
         if self.fileName:
-            return open(self.fileName, 'r')
+            return openFile( self.fileName )
         else:
             raise Exception("Filename is not set.")
 
+    # Columns of the header whose value in the first data row is a number,
+    # returned in header order along with the (un-consumed) rows
+    def numericColumns( self, header, rows ):
+        rows = iter( rows )
+        first = next( ( row for row in rows if row.split() ), None )
+        if first is None:
+            return OrderedDict(), []
+
+        ycol = OrderedDict()
+        for key, value in zip( header, first.split() ):
+            try:
+                float( value )
+                ycol[key] = float
+            except ValueError:
+                continue
+        return ycol, itertools.chain( [first], rows )
+
     def getData( self, header, rows, xcol, ycol ):
         xID = None
         yID = None
+        if ycol == allColumns:
+            ycol, rows = self.numericColumns( header, rows )
+
         # X column header
         if xcol: 
             if set(xcol).issubset(set(header)):
@@ -170,46 +416,105 @@ class FileType(object):
                                        ycol=ycol, yID=yID )
           
     def convertData( self, rows, xcol=None, xID=None, ycol=None, yID=None ):
-        # Get data, where data{key=column header, value=data list}
+        # Get data, where data{key=column header, value=data array}
         # and column header = [x column, ycolumns=(y column 1, y column 2, ...) ]
-        data = dict()
-        for row in rows:
-            if row:
-                values = row.split()
-                if xcol:
-                    for key in xcol:
-                        convertType = xcol[key]
-                        index       = xID[key]
-                        if key in data:
-                            value = float( values[index] )
-                            data[key].append( convertType(value) )
-                        else:
-                            value = float( values[index] )
-                            data[key] = [convertType(value)]
-                if ycol:
-                    for key in ycol:
-                        convertType = ycol[key]
-                        index       = yID[key]
-
-                        #--- string case ---#
-
-                        if convertType == str:
-                            if key in data:
-                                data[key].append( convertType(values[index]) )
-                            else:
-                                data[key] = [convertType(values[index])]
-
-                        #--- number case ---#
-
-                        else:
-                            if key in data:
-                                value = float( values[index] )
-                                data[key].append( convertType(value) )
-                            else:
-                                value = float( values[index] )
-                                data[key] = [convertType(value)]
+        #   - numeric columns are NumPy arrays of the dtype given as the column
+        #     type (float -> float64, int -> int64, np.float32, ...), str columns
+        #     are arrays of strings
+        #   - rows that are truncated or have a non-numeric value in a requested
+        #     numeric column are skipped
+        columns = OrderedDict()
+        for col, ID in ( (xcol, xID), (ycol, yID) ):
+            if col:
+                for key in col:
+                    columns[key] = ( ID[key], col[key] )
+
+        data = OrderedDict()
+        if not columns:
+            return data
+
+        values = dict( (key, []) for key in columns )
+        for batch in self.rowBatches( rows ):
+            if not self.convertBlock( batch, columns, values ):
+                self.convertRows( batch, columns, values )
+
+        for key, (index, convertType) in columns.items():
+            if convertType is str:
+                data[key] = np.array( list( itertools.chain.from_iterable( values[key] ) ), dtype=str )
+            elif values[key]:
+                data[key] = np.concatenate( values[key] ).astype( convertType )
+            else:
+                data[key] = np.zeros( 0, dtype=convertType )
         return data
 
+    # Non-blank rows in lists of up to batchSize rows
+    batchSize = 2**16
+
+    def rowBatches( self, rows ):
+        batch = []
+        for row in rows:
+            if row and not row.isspace():
+                batch.append( row )
+                if len(batch) == self.batchSize:
+                    yield batch
+                    batch = []
+        if batch:
+            yield batch
+
+    # Fast path: a batch of rows that are all numeric with the same number of
+    # columns is parsed by NumPy in one call and the requested columns sliced
+    # out. Returns False (and leaves values untouched) for any other batch.
+    def convertBlock( self, rows, columns, values ):
+        if any( convertType is str for index, convertType in columns.values() ):
+            return False
+
+        ncols = len( rows[0].split() )
+        if ncols <= max( index for index, convertType in columns.values() ):
+            return False
+        # a short and a long row would give the right total number of
+        # values but shift every row after them
+        if not all( len( row.split() ) == ncols for row in rows ):
+            return False
+
+        with warnings.catch_warnings():
+            warnings.simplefilter( 'ignore' )
+            block = np.fromstring( ' '.join(rows), sep=' ' )
+        if block.size != len(rows) * ncols:
+            return False
+
+        block = block.reshape( len(rows), ncols )
+        for key, (index, convertType) in columns.items():
+            values[key].append( block[:,index].copy() )
+        return True
+
+    # Row by row path: only the requested columns are tokenized (split up to
+    # the last one needed) and bad rows are dropped
+    def convertRows( self, rows, columns, values ):
+        maxsplit = max( index for index, convertType in columns.values() ) + 1
+        numbers  = [ (key, index) for key, (index, convertType) in columns.items()
+                                  if convertType is not str ]
+        strings  = [ (key, index) for key, (index, convertType) in columns.items()
+                                  if convertType is str ]
+        converted = dict( (key, array.array('d')) for key, index in numbers )
+        converted.update( (key, []) for key, index in strings )
+
+        for row in rows:
+            tokens = row.split( None, maxsplit )
+            if len(tokens) < maxsplit: continue
+            try:
+                numeric = [ float( tokens[index] ) for key, index in numbers ]
+            except ValueError:
+                continue
+            for (key, index), value in zip( numbers, numeric ):
+                converted[key].append( value )
+            for key, index in strings:
+                converted[key].append( tokens[index] )
+
+        for key, index in numbers:
+            values[key].append( np.array( converted[key], dtype=float ) )
+        for key, index in strings:
+            values[key].append( converted[key] )
+
 
 #---------------------------------------------------------------------------------#
 #   LAMMPS Log File Class                                                         #
@@ -265,76 +570,655 @@ class LAMMPSLog(FileType):
                     "Massively Parallel Simulator.")
         return descript
 
-    def data(self, xcol=None, ycol=None):
+    index = None
+
+    # chunks: indices of the thermo chunks to read (negative from the end)
+    # steps:  (first, last) Step range the chunks must overlap
+    # Without either every chunk is parsed in one streaming pass, with them
+    # only the selected sections found by the chunk index are read
+    def data(self, xcol=None, ycol=None, chunks=None, steps=None):
+        if chunks is not None or steps is not None:
+            return self.selectedData( xcol, ycol, chunks, steps )
+
         data = dict()
+        profiler = profiling.getProfiler()
         with self.file_obj as f:
-            logfile = f.read()
+            for i, (header, rows) in enumerate( self.thermoChunks(f) ):
+                with profiler.phase( 'parse', chunk=i ) as phase:
+                    data[i] = self.getData( header, phase.counted(rows), xcol, ycol )
 
-            pattern = re.compile(r'Mbytes\s+(.*?)\s+($|Loop|WARNING)', re.DOTALL)
-            for i, lines in enumerate( re.findall(pattern, logfile) ):
-                data[i] = self.getDataLAMMPS( lines[0], xcol, ycol )
+        return data
 
+    def chunkIndex( self ):
+        if self.index is None or self.index.fileName != self.fileName \
+                              or not self.index.isCurrent( self.fileName ):
+            self.index = LAMMPSLogIndex( self.fileName )
+        return self.index
+
+    def selectChunks( self, fileName, chunks=None, steps=None ):
+        self.fileName = fileName
+        return self.chunkIndex().select( chunks, steps )
+
+    def selectedData( self, xcol, ycol, chunks, steps ):
+        data = dict()
+        index    = self.chunkIndex()
+        selected = index.select( chunks, steps )
+        if not selected:
+            return data
+
+        profiler = profiling.getProfiler()
+        mm = index.openBlocks( self.fileName )
+        try:
+            for i in selected:
+                chunk = index.chunks[i]
+                with profiler.phase( 'parse', chunk=i ) as phase:
+                    phase.add( bytes=chunk['end'] - chunk['start'], rows=chunk['rows'] )
+                    rows = mm.lines( chunk['start'], chunk['end'] )
+                    data[i] = self.getData( chunk['header'], rows, xcol, ycol )
+        finally:
+            mm.close()
         return data
- 
-    def getDataLAMMPS( self, logData, xcol, ycol):
-        logData = logData.split("\n")
-        header  = logData[0].split()
-        rows    = logData[1:]
-        data    = self.getData( header, rows, xcol, ycol )
+
+    # Line-oriented state machine over the log file: a thermo chunk
+    # starts with the header line following the "... Mbytes" memory line
+    # and ends at the "Loop time" summary, a WARNING or the end of file.
+    # Yields (header, rows) where rows is a generator over the chunk lines,
+    # so only one line of the log is held in memory at a time.
+    @staticmethod
+    def isChunkStart( line ):
+        return 'Mbytes' in line
+
+    @staticmethod
+    def isChunkEnd( line ):
+        return line.lstrip().startswith( ('Loop', 'WARNING') )
+
+    def thermoChunks( self, lines ):
+        lines = iter( lines )
+        for line in lines:
+            if not self.isChunkStart( line ): continue
+
+            header = None
+            for line in lines:
+                header = line.split()
+                if header: break
+            if not header: return
+
+            rows = self.thermoRows( lines )
+            yield header, rows
+            for row in rows: pass
+
+    def thermoRows( self, lines ):
+        for line in lines:
+            if self.isChunkEnd( line ): return
+            if line.strip(): yield line
+
+#---------------------------------------------------------------------------------#
+#   LAMMPS Log Chunk Index                                                        #
+#     One cheap pre-scan of the log records, for every thermo chunk, the byte     #
+#     range of its rows, its header, number of rows and first / last Step, so a   #
+#     selection of chunks is read without parsing the others. Chunk boundaries    #
+#     are the same as those of LAMMPSLog.thermoChunks.                            #
+#---------------------------------------------------------------------------------#
+class LAMMPSLogIndex(FileIndex):
+    def __init__(self, fileName):
+        self.fileName = fileName
+        self.stamp    = self.fileStamp( fileName )
+        self.chunks   = self.build()
+
+    def build( self ):
+        chunks = []
+        if os.path.getsize( self.fileName ) == 0:
+            return chunks
+        if compression( self.fileName ):
+            return self.buildStream()
+
+        mm = self.openBlocks( self.fileName )
+        try:
+            size, pos = mm.size(), 0
+            while True:
+                found = mm.find( 'Mbytes', pos )
+                if found < 0: break
+
+                header, start = None, mm.find( '\n', found ) + 1
+                while 0 < start < size:
+                    end    = mm.find( '\n', start )
+                    end    = size if end < 0 else end
+                    header = mm[start:end].split()
+                    start  = end + 1
+                    if header: break
+                if not header: break
+
+                end = self.chunkEnd( mm, min( start, size ) )
+                chunks.append( self.chunkInfo( mm, header, min( start, size ), end ) )
+                pos = end
+        finally:
+            mm.close()
+        return chunks
+
+    # Start of the first line from pos on that begins (after blanks) with
+    # Loop or WARNING, the end of the file if there is none
+    def chunkEnd( self, mm, pos ):
+        end = mm.size()
+        for word in ( 'Loop', 'WARNING' ):
+            found = mm.find( word, pos, end )
+            while found >= 0:
+                lineStart = mm.rfind( '\n', pos, found ) + 1 or pos
+                if not mm[lineStart:found].strip():
+                    end = lineStart
+                    break
+                found = mm.find( word, found + 1, end )
+        return end
+
+    # Rows are counted as the non-blank lines, in slices cut at line ends
+    # so the section is never copied whole; the Steps come from the first
+    # and last rows
+    blankLine = re.compile( r'\n[ \t\r\f\v]*(?=\n)' )
+
+    def chunkInfo( self, mm, header, start, end ):
+        rows, lo = 0, start
+        while lo < end:
+            hi = mm.find( '\n', min( lo + 2**24, end - 1 ) ) + 1
+            hi = end if hi <= 0 or hi > end else hi
+            block = mm[lo:hi]
+            if block.endswith( '\n' ):
+                block = block[:-1]
+            rows += block.count( '\n' ) + 1 - \
+                    len( self.blankLine.findall( '\n' + block + '\n' ) )
+            lo = hi
+
+        lines = mm[ start : min( end, start + 4096 ) ].split( '\n' )
+        first = self.stepOf( header, lines )
+        lines = mm[ max( start, end - 4096 ) : end ].split( '\n' )
+        last  = self.stepOf( header, lines[::-1] )
+        return { 'start' : start, 'end'   : end,   'header' : header,
+                 'rows'  : rows,  'first' : first, 'last'   : last }
+
+    @staticmethod
+    def stepOf( header, lines ):
+        if 'Step' not in header:
+            return None
+        column = header.index( 'Step' )
+        for line in lines:
+            tokens = line.split()
+            if len(tokens) == len(header):
+                try:
+                    return int( float( tokens[column] ) )
+                except ValueError:
+                    continue
+        return None
+
+    # Same index from the lines of a compressed file (offsets in the
+    # decompressed stream), following the LAMMPSLog.thermoChunks states
+    def buildStream( self ):
+        chunks = []
+        state, chunk, offset = 'search', None, 0
+        with openFile( self.fileName ) as f:
+            for line in f:
+                start, offset = offset, offset + len( line )
+                if state == 'search':
+                    if LAMMPSLog.isChunkStart( line ):
+                        state = 'header'
+
+                elif state == 'header':
+                    if line.split():
+                        chunk = { 'start' : offset, 'end'   : None,
+                                  'header': line.split(),
+                                  'rows'  : 0,      'first' : None, 'last' : None }
+                        state = 'rows'
+
+                elif LAMMPSLog.isChunkEnd( line ):
+                    chunk['end'] = start
+                    chunks.append( chunk )
+                    state = 'search'
+
+                elif line.strip():
+                    chunk['rows'] += 1
+                    step = self.stepOf( chunk['header'], [ line ] )
+                    if step is not None:
+                        if chunk['first'] is None: chunk['first'] = step
+                        chunk['last'] = step
+
+        if state == 'rows':
+            chunk['end'] = offset
+            chunks.append( chunk )
+        return chunks
+
+    # chunks: list of chunk indices (negative ones count from the end)
+    # steps:  (first, last) Step range, chunks overlapping it are selected
+    def select( self, chunks=None, steps=None ):
+        selected = range( len(self.chunks) )
+        if chunks is not None:
+            try:
+                selected = sorted( set( selected[i] for i in chunks ) )
+            except IndexError:
+                raise Exception( "Chunk index out of range: " + self.fileName + \
+                                 " has " + str(len(self.chunks)) + " thermo chunks." )
+        if steps is not None:
+            first, last = steps
+            selected = [ i for i in selected if self.chunks[i]['first'] is not None
+                         and self.chunks[i]['first'] <= last
+                         and self.chunks[i]['last']  >= first ]
+        return selected
+
+#---------------------------------------------------------------------------------#
+#   LAMMPS Log Follower - incremental reads of a log that is still being written  #
+#     Keeps the byte offset of the last complete line consumed and the state of   #
+#     the LAMMPSLog chunk state machine, so every poll() only parses the thermo   #
+#     rows appended since the previous one.                                       #
+#---------------------------------------------------------------------------------#
+class LAMMPSLogFollower(object):
+    def __init__(self, fileName, ycol):
+        self.fileName = fileName
+        self.ycol     = ycol
+        self.reader   = LAMMPSLog( 'LAMMPS_Log' )
+        self.reader.fileName = fileName
+        self.reset()
+
+    def reset(self):
+        self.offset = 0
+        self.chunk  = -1
+        self.state  = 'search'
+        self.header = None
+
+    def poll(self):
+        data = OrderedDict()
+        if not os.path.exists( self.fileName ):
+            return data
+        if os.path.getsize( self.fileName ) < self.offset:
+            self.reset()                    # log was truncated / restarted
+
+        rows = []
+        with open( self.fileName, 'r' ) as f:
+            f.seek( self.offset )
+            while True:
+                line = f.readline()
+                if not line.endswith('\n'): break     # EOF or line being written
+                self.offset = f.tell()
+
+                if self.state == 'search':
+                    if self.reader.isChunkStart( line ):
+                        self.state = 'header'
+
+                elif self.state == 'header':
+                    if line.split():
+                        self.header = line.split()
+                        self.chunk += 1
+                        self.state  = 'rows'
+
+                elif self.reader.isChunkEnd( line ):
+                    self.collect( data, rows )
+                    rows = []
+                    self.state = 'search'
+
+                elif line.strip():
+                    rows.append( line )
+
+        self.collect( data, rows )
         return data
 
+    def collect(self, data, rows):
+        if not rows: return
+        data[self.chunk] = self.reader.getData( self.header, rows,
+                                                None, self.ycol )
+
+#----------------------------------------------------------------------------#
+#   LAMMPS Dump File Frame Index                                             #
+#     Built once per file: for every frame records the timestep, # of atoms  #
+#     and byte offsets of the TIMESTEP, NUMBER OF ATOMS, BOX BOUNDS and      #
+#     ATOMS items. The atom lines are jumped over (find of the next ITEM     #
+#     line) instead of being read, and sections of any frame are then read  #
+#     back through mmap without touching the rest of the file.              #
+#----------------------------------------------------------------------------#
+class LAMMPSDumpIndex(FileIndex):
+    items = [ 'TIMESTEP', 'NUMBER OF ATOMS', 'BOX BOUNDS', 'ATOMS' ]
+
+    def __init__(self, fileName):
+        self.fileName = fileName
+        self.stamp    = self.fileStamp( fileName )
+        self.frames   = self.build()
+
+    def build( self ):
+        frames = []
+        if os.path.getsize( self.fileName ) == 0:
+            return frames
+        if compression( self.fileName ):
+            return self.buildStream()
+
+        mm = self.open()
+        try:
+            frame = None
+            while True:
+                offset = mm.tell()
+                line   = mm.readline()
+                if not line: break
+                if not line.startswith('ITEM:'): continue
+
+                item = line[5:].strip()
+                if item.startswith('TIMESTEP'):
+                    if frame: 
+                        frame['end'] = offset
+                        frames.append( frame )
+                    frame = { 'offsets' : { 'TIMESTEP' : offset },
+                              'natoms'  : 0 }
+                    frame['timestep'] = int( mm.readline() )
+
+                elif frame is None:
+                    continue
+
+                elif item.startswith('NUMBER OF ATOMS'):
+                    frame['offsets']['NUMBER OF ATOMS'] = offset
+                    frame['natoms'] = int( mm.readline() )
+
+                elif item.startswith('BOX BOUNDS'):
+                    frame['offsets']['BOX BOUNDS'] = offset
+                    for i in range(3): mm.readline()
+
+                elif item.startswith('ATOMS'):
+                    frame['offsets']['ATOMS'] = offset
+                    # jump over the atom lines to the next ITEM line
+                    following = mm.find( '\nITEM:', mm.tell() - 1 )
+                    mm.seek( following + 1 if following >= 0 else mm.size() )
+
+            if frame:
+                frame['end'] = mm.tell()
+                frames.append( frame )
+        finally:
+            mm.close()
+
+        return frames
+
+    # Same index from one pass over a compressed file, the offsets being
+    # those in the decompressed stream. Decompressed blocks are searched for
+    # "\nITEM:" (the stream is prefixed with a newline, hence base = -1) and
+    # only the ITEM lines and the value line after them are looked at.
+    def buildStream( self ):
+        frames = []
+        frame  = None
+        buffer, base, pos, eof = '\n', -1, 0, False
+        with openFile( self.fileName ) as f:
+            while True:
+                found = buffer.find( '\nITEM:', pos )
+                end   = buffer.find( '\n', found + 1 ) if found >= 0 else -1
+                after = buffer.find( '\n', end + 1 )   if end   >= 0 else -1
+                if after < 0:
+                    if eof: break
+                    keep  = found if found >= 0 else max( pos, len(buffer) - 5 )
+                    block = f.read( 2**20 )
+                    if not block:
+                        eof, block = True, '\n'
+                    base, buffer, pos = base + keep, buffer[keep:] + block, 0
+                    continue
+
+                pos    = end
+                offset = base + found + 1
+                item   = buffer[found+6:end].strip()
+                value  = buffer[end+1:after]
+                if item.startswith('TIMESTEP'):
+                    if frame:
+                        frame['end'] = offset
+                        frames.append( frame )
+                    frame = { 'offsets'  : { 'TIMESTEP' : offset },
+                              'natoms'   : 0,
+                              'timestep' : int( value ) }
+
+                elif frame is None:
+                    continue
+
+                else:
+                    for name in self.items[1:]:
+                        if item.startswith( name ):
+                            frame['offsets'][name] = offset
+                    if item.startswith('NUMBER OF ATOMS'):
+                        frame['natoms'] = int( value )
+
+        if frame:
+            frame['end'] = base + len( buffer ) - 1
+            frames.append( frame )
+        return frames
+
+    @property
+    def timesteps( self ):
+        return [ frame['timestep'] for frame in self.frames ]
+
+    # frames:    slice, list of frame indices or a single frame index
+    # timesteps: (first, last) inclusive range of timesteps
+    def select( self, frames=None, timesteps=None ):
+        selected = self.frames
+        if frames is not None:
+            if isinstance( frames, slice ):
+                selected = selected[frames]
+            elif isinstance( frames, int ):
+                selected = [ selected[frames] ]
+            else:
+                selected = [ selected[i] for i in frames ]
+        if timesteps is not None:
+            first, last = timesteps
+            selected = [ frame for frame in selected 
+                               if first <= frame['timestep'] <= last ]
+        return selected
+
+    # Byte range of an item section: from its ITEM line to the next item
+    def sectionRange( self, frame, item ):
+        if item not in frame['offsets']:
+            raise Exception('ITEM: ' + item + ' not found for timestep ' \
+                            + str(frame['timestep']) + ' in ' + self.fileName )
+        start = frame['offsets'][item]
+        later = [ offset for offset in frame['offsets'].values() if offset > start ]
+        return start, min( later + [ frame['end'] ] )
+
+    def readSection( self, mm, frame, item ):
+        start, end = self.sectionRange( frame, item )
+        return mm[start:end]
+
+#----------------------------------------------------------------------------#
+#   LAMMPS Dump File Parent Class - shares the frame index across readers    #
+#----------------------------------------------------------------------------#
+class LAMMPSDumpIndexed(FileType):
+    index = None
+
+    def frameIndex( self ):
+        if self.index is None or self.index.fileName != self.fileName \
+                              or not self.index.isCurrent( self.fileName ):
+            self.index = LAMMPSDumpIndex( self.fileName )
+        return self.index
+
+    def readSections( self, item, frames=None, timesteps=None ):
+        index    = self.frameIndex()
+        selected = index.select( frames, timesteps )
+        if not selected:
+            return
+        mm = index.open()
+        try:
+            for frame in selected:
+                yield frame, index.readSection( mm, frame, item )
+        finally:
+            mm.close()
+
 #----------------------------------------------------------------------------#
 #   LAMMPS Dump File Class                                                   #
 #----------------------------------------------------------------------------#
-class LAMMPSDump(FileType):
+class LAMMPSDump(LAMMPSDumpIndexed):
     @property
     def format(self): 
         descript = ( 'LAMMPS Dump File - Large-scale Atomic / Molecular ' 
                     'Massively Parallel Simulator.' )
         return descript
 
-    def data(self, xcol, ycol):
+    def data(self, xcol, ycol, frames=None, timesteps=None):
         data = dict()
-        with self.file_obj as f:
-            dumpfile = f.read()
-            #pattern = re.compile(r'TIMESTEP(.*?)ITEM:.*?ITEM:\s+ENTRIES(.*?)($|ITEM)', re.DOTALL)
-            pattern = re.compile(r'TIMESTEP(.*?)ITEM:.*?ITEM:\s+ATOMS(.*?)($|ITEM)', re.DOTALL)
-            for lines in re.findall(pattern, dumpfile):
-                data[int(lines[0])] = self.getDataLAMMPS( lines[1], xcol, ycol )
-            
+        with profiling.getProfiler().phase( 'parse' ) as phase:
+            for frame, lines in self.readSections( 'ATOMS', frames, timesteps ):
+                data[frame['timestep']] = self.getDataLAMMPS( lines, xcol, ycol )
+                phase.add( bytes=len(lines), rows=frame['natoms'] )
         return data
  
     def getDataLAMMPS( self, dumpData, xcol, ycol ):
         dumpData = dumpData.split("\n")
-        header  = dumpData[0].split()
+        header  = dumpData[0].split()[2:]
         rows    = dumpData[1:]
         data    = self.getData( header, rows, xcol, ycol )
         return data
 
+#----------------------------------------------------------------------------#
+#   LAMMPS Dump File Class - parallel decoding of the ATOMS sections of the  #
+#   selected frames into one (frames x atoms x columns) array in shared      #
+#   memory. The frame index splits the file at frame boundaries and a pool   #
+#   of workers decodes ranges of frames straight into the shared array, so   #
+#   only (frame, byte range) tasks are pickled and nothing is copied back.   #
+#----------------------------------------------------------------------------#
+# Worker side state: the shared array is handed to the workers when the
+# pool is started (inherited on fork), it cannot travel with the tasks
+dumpShared = dict()
+
+def initDumpWorker( raw, shape, dtype, fileName ):
+    dumpShared.update( raw=raw, shape=shape, dtype=dtype, fileName=fileName )
+
+def decodeDumpFrames( task ):
+    columns, sortBy, ranges = task
+    out = np.frombuffer( dumpShared['raw'], dtype=dumpShared['dtype'] )
+    out = out.reshape( dumpShared['shape'] )
+    mm  = LAMMPSDumpIndex.openSections( dumpShared['fileName'] )
+    try:
+        for i, start, end in ranges:
+            out[i] = decodeAtoms( mm[start:end], columns, sortBy )
+    finally:
+        mm.close()
+    return len( ranges )
+
+# (atoms x columns) values of the requested columns of one ATOMS section,
+# optionally ordered by another column (e.g. 'id' for unsorted dumps)
+def decodeAtoms( section, columns, sortBy=None ):
+    header, body = section.split( '\n', 1 )
+    header = header.split()[2:]
+    missing = [ key for key in list(columns) + [ sortBy ] 
+                    if key and key not in header ]
+    if missing:
+        raise Exception( "ERROR: " + str(missing) + " NOT Found in the "\
+                         "ATOMS header: " + ' '.join(header) )
+
+    with warnings.catch_warnings():
+        warnings.simplefilter( 'ignore' )
+        values = np.fromstring( body, sep=' ' )
+    if values.size % len(header):
+        raise Exception( "ERROR: non numeric or truncated ATOMS section "\
+                         "(columns: " + ' '.join(header) + ")" )
+    values = values.reshape( -1, len(header) )
+    if sortBy:
+        values = values[ np.argsort( values[:,header.index(sortBy)], kind='mergesort' ) ]
+    return values[:, [ header.index(key) for key in columns ] ]
+
+class LAMMPSDumpParallel(LAMMPSDump):
+    workers = None
+    sortBy  = None
+
+    @property
+    def format(self): 
+        descript = ( 'LAMMPS Dump File - Large-scale Atomic / Molecular ' 
+                    'Massively Parallel Simulator. ATOMS sections decoded in '
+                    'parallel into one shared array' )
+        return descript
+
+    # Same {timestep : {column : values}} layout as LAMMPSDump, the values
+    # being views into the (frames x atoms x columns) array
+    def data(self, xcol, ycol, frames=None, timesteps=None):
+        columns = OrderedDict()
+        for col in ( xcol, ycol ):
+            if col == allColumns:
+                col = self.numericHeader()
+            if col:
+                columns.update( col )
+        if any( columns[key] is str for key in columns ):
+            raise Exception("LAMMPSDumpParallel only reads numeric columns.")
+        dtype = np.result_type( *[ np.dtype(columns[key]) for key in columns ] ) \
+                if columns else np.dtype(float)
+
+        steps, values = self.readArray( self.fileName, list(columns), frames,
+                                        timesteps, dtype )
+        data = dict()
+        for i, timestep in enumerate( steps.tolist() ):
+            data[timestep] = OrderedDict( (key, values[i,:,j])
+                                          for j, key in enumerate( columns ) )
+        return data
+
+    def numericHeader( self ):
+        for frame, lines in self.readSections( 'ATOMS', frames=slice(0,1) ):
+            lines  = lines.split( '\n' )
+            header = lines[0].split()[2:]
+            return self.numericColumns( header, lines[1:] )[0]
+        return OrderedDict()
+
+    # Returns the timesteps and the (frames x atoms x columns) array of the
+    # selected frames, all of which must have the same number of atoms
+    def readArray(self, fileName, columns, frames=None, timesteps=None,
+                        dtype=float, workers=None):
+        self.fileName = fileName
+        index    = self.frameIndex()
+        selected = index.select( frames, timesteps )
+        natoms   = set( frame['natoms'] for frame in selected )
+        if len(natoms) > 1:
+            raise Exception("Frames of " + fileName + " differ in their number " \
+                            "of atoms " + str(sorted(natoms)) + ", select frames " \
+                            "with the same number of atoms.")
+
+        dtype = np.dtype( dtype )
+        shape = ( len(selected), natoms.pop() if natoms else 0, len(columns) )
+        steps = np.array( [ frame['timestep'] for frame in selected ], dtype=int )
+        if not all( shape ):
+            return steps, np.zeros( shape, dtype=dtype )
+        raw   = multiprocessing.RawArray( ctypes.c_char,
+                                          int( np.prod(shape) ) * dtype.itemsize )
+
+        ranges = [ (i,) + index.sectionRange( frame, 'ATOMS' )
+                   for i, frame in enumerate( selected ) ]
+        workers = workers or self.workers or multiprocessing.cpu_count()
+        workers = max( 1, min( workers, len(ranges) ) )
+        ntasks  = min( len(ranges), 4 * workers )
+        if compression( fileName ):
+            workers = ntasks = 1    # every task would decompress from the start
+        tasks   = [ ( list(columns), self.sortBy,
+                      ranges[ i*len(ranges)//ntasks : (i+1)*len(ranges)//ntasks ] )
+                    for i in range( ntasks ) ]
+        initargs = ( raw, shape, dtype, fileName )
+
+        with profiling.getProfiler().phase( 'parse' ) as phase:
+            if workers == 1:
+                initDumpWorker( *initargs )
+                try:
+                    map( decodeDumpFrames, tasks )
+                finally:
+                    dumpShared.clear()
+            else:
+                pool = multiprocessing.Pool( workers, initDumpWorker, initargs )
+                try:
+                    pool.map( decodeDumpFrames, tasks, chunksize=1 )
+                finally:
+                    pool.close()
+                    pool.join()
+            phase.add( bytes=sum( end - start for i, start, end in ranges ),
+                       rows=shape[0] * shape[1] )
+
+        values = np.frombuffer( raw, dtype=dtype, count=int( np.prod(shape) ) )
+        return steps, values.reshape( shape )
+
 #----------------------------------------------------------------------------#
 #   LAMMPS Dump File Class - Specifically get box bounds                     #
 #----------------------------------------------------------------------------#
-class LAMMPSDumpBoxBounds(FileType):
+class LAMMPSDumpBoxBounds(LAMMPSDumpIndexed):
     @property
     def format(self): 
         descript = ( 'LAMMPS Dump File - Large-scale Atomic / Molecular ' 
                     'Massively Parallel Simulator. Get Box Bounds sections' )
         return descript
 
-    def data(self, xcol=None, ycol=None):
+    def data(self, xcol=None, ycol=None, frames=None, timesteps=None):
         data = dict()
-        with self.file_obj as f:
-            dumpfile = f.read()
-            #pattern = re.compile(r'TIMESTEP(.*?)ITEM:.*?ITEM:\s+ENTRIES(.*?)($|ITEM)', re.DOTALL)
-            pattern = re.compile(r'TIMESTEP(.*?)ITEM:.*?ITEM:\s+BOX\sBOUNDS(.*?)($|ITEM)', re.DOTALL)
-            for lines in re.findall(pattern, dumpfile):
-                data[int(lines[0])] = self.getDataLAMMPSBox( lines[1] )
-            
+        for frame, lines in self.readSections( 'BOX BOUNDS', frames, timesteps ):
+            data[frame['timestep']] = self.getDataLAMMPSBox( lines )
         return data
  
     def getDataLAMMPSBox( self, dumpData):
         dumpData = dumpData.split("\n")
-        header  = dumpData[0].split()
+        header  = dumpData[0].split()[3:]
         rows    = dumpData[1:]
         data = dict()
         data['x'] = [ header[0], float(rows[0].split()[0]), float(rows[0].split()[1]) ]
@@ -345,87 +1229,342 @@ class LAMMPSDumpBoxBounds(FileType):
 #----------------------------------------------------------------------------#
 #   LAMMPS Dump File Class - Specifically get # of atoms                     #
 #----------------------------------------------------------------------------#
-class LAMMPSDumpAtomsBounds(FileType):
+class LAMMPSDumpAtomsBounds(LAMMPSDumpIndexed):
     @property
     def format(self): 
         descript = ( 'LAMMPS Dump File - Large-scale Atomic / Molecular ' 
                     'Massively Parallel Simulator. Get NUMBER OF ATOMS sections' )
         return descript
 
-    def data(self, xcol=None, ycol=None):
+    # answered from the frame index alone, no section of the file is re-read
+    def data(self, xcol=None, ycol=None, frames=None, timesteps=None):
         data = dict()
-        with self.file_obj as f:
-            dumpfile = f.read()
-            #pattern = re.compile(r'TIMESTEP(.*?)ITEM:.*?ITEM:\s+ENTRIES(.*?)($|ITEM)', re.DOTALL)
-            pattern = re.compile(r'TIMESTEP(.*?)ITEM:\s+NUMBER\sOF\sATOMS(.*?)($|ITEM)', re.DOTALL)
-            for lines in re.findall(pattern, dumpfile):
-                data[int(lines[0])] = self.getDataLAMMPSAtoms( lines[1] )
-            
+        for frame in self.frameIndex().select( frames, timesteps ):
+            data[frame['timestep']] = str( frame['natoms'] )
         return data
- 
-    def getDataLAMMPSAtoms( self, dumpData):
-        return dumpData.split()[0]
 
 #----------------------------------------------------------------------------#
-#   LAMMPS Compute Dumps                                                     #
+#   LAMMPS fix ave/time (and compute) Output File Class                      #
+#     Scalar mode: '# TimeStep c1 c2 ...' then one row per timestep          #
+#       -> values (rows x columns)                                           #
+#     Vector mode: '# TimeStep Number-of-rows' and '# Row c1 c2 ...' then    #
+#       per timestep a 'step nrows' line followed by nrows rows              #
+#       -> values (timesteps x rows x columns), blockValues (timesteps x 2)  #
+#     The body is read in blocks of lines, each converted by NumPy in one    #
+#     call. Timesteps with fewer rows than the largest are padded with NaN.  #
 #----------------------------------------------------------------------------#
+ComputeData = namedtuple( 'ComputeData', [ 'header', 'values',
+                                           'blockHeader', 'blockValues' ] )
+
 class LAMMPSCompute(FileType):
+    blockLines = 2**16
+
     @property
     def format(self): 
-        descript = ( 'LAMMPS Compute Dump File - Large-scale Atomic / Molecular ' 
-                    'Massively Parallel Simulator. Get Box Bounds sections' )
+        descript = ( 'LAMMPS fix ave/time output File - Large-scale Atomic / Molecular ' 
+                    'Massively Parallel Simulator. Scalar and vector mode' )
         return descript
 
+    # Scalar mode: { 0 : {column : values} }
+    # Vector mode: { row : {column : values over the timesteps} } where the
+    #   block header columns (TimeStep, ...) are available for every row
     def data(self, xcol=None, ycol=None):
+        compute = self.readCompute( self.fileName )
+        header  = list( compute.header )
+        if compute.blockValues is None:
+            series = [ compute.values ]
+        else:
+            header += [ key for key in compute.blockHeader if key not in header ]
+            series = [ np.column_stack( [ compute.values[:,row,:], compute.blockValues ] )
+                       for row in range( compute.values.shape[1] ) ]
+
+        columns = OrderedDict()
+        for col in ( xcol, ycol ):
+            if col == allColumns:
+                col = OrderedDict( (key, float) for key in header )
+            if col:
+                columns.update( col )
+        if not set( columns ).issubset( set( header ) ):
+            raise Exception( "ERROR: One of the following column headers: " \
+                              + str(set(columns)) + " was NOT Found in "\
+                              + self.fileName + " LAMMPS compute file "\
+                              "header section. \n Header list: " + ' '.join(header) )
+
         data = dict()
-        with self.file_obj as f:
-            # pre-process file to pull out header (3rd line) and body (5th to end)
-            dumpfile = f.read().split('\n')
-            lines = str(dumpfile[2].split("# ")[1] + '\n')
-            cols=len(lines.split())
-            for line in dumpfile[4:]:
-                if len(line.split()) != cols: continue
-                lines += str(line + '\n')
-            data[0] = self.getDataLAMMPSCompute( lines, xcol, ycol )
-        return data
- 
-    def getDataLAMMPSCompute( self, logData, xcol, ycol ):
-        logData = logData.split("\n")
-        header  = logData[0].split()
-        rows    = logData[1:]
-        data    = self.getData( header, rows, xcol, ycol )
+        for key, values in enumerate( series ):
+            data[key] = OrderedDict()
+            for col, convertType in columns.items():
+                column = values[ :, header.index(col) ]
+                if column.dtype != np.dtype( convertType ):
+                    column = column.astype( convertType )
+                data[key][col] = column
         return data
 
+    def readCompute(self, fileName, dtype=float):
+        self.fileName = fileName
+        with openFile( fileName ) as f:
+            comments = []
+            line = f.readline()
+            while line.startswith( '#' ):
+                comments.append( line.lstrip( '#' ).split() )
+                line = f.readline()
+            if len( comments ) < 2:
+                raise Exception( fileName + " has no fix ave/time header lines." )
+
+            lines = itertools.chain( [ line ], f )
+            with profiling.getProfiler().phase( 'parse' ) as phase:
+                if len( comments ) == 2:
+                    values = self.scalarRows( lines, len( comments[-1] ), dtype, phase )
+                    return ComputeData( comments[-1], values, None, None )
+                blocks, values = self.vectorBlocks( lines, len( comments[-2] ),
+                                                    len( comments[-1] ), dtype, phase )
+                return ComputeData( comments[-1], values, comments[-2], blocks )
+
+    def lineBatches(self, lines, phase):
+        batch = []
+        for line in lines:
+            if line.strip():
+                batch.append( line )
+                if len( batch ) == self.blockLines:
+                    phase.add( bytes=sum( len(row) for row in batch ) if phase.enabled else 0 )
+                    yield batch
+                    batch = []
+        if batch:
+            phase.add( bytes=sum( len(row) for row in batch ) if phase.enabled else 0 )
+            yield batch
+
+    # (rows x ncols) array of whitespace separated numbers
+    def decodeRows(self, rows, ncols, dtype):
+        with warnings.catch_warnings():
+            warnings.simplefilter( 'ignore' )
+            values = np.fromstring( ' '.join( rows ), sep=' ' )
+        if values.size != len( rows ) * ncols:
+            raise Exception( "Rows with other than " + str(ncols) + " numbers in " \
+                             + self.fileName )
+        return values.reshape( len( rows ), ncols ).astype( dtype, copy=False )
+
+    def scalarRows(self, lines, ncols, dtype, phase):
+        values = [ np.zeros( (0, ncols), dtype=dtype ) ]
+        for batch in self.lineBatches( lines, phase ):
+            values.append( self.decodeRows( batch, ncols, dtype ) )
+            phase.add( rows=len( batch ) )
+        return np.concatenate( values )
+
+    def vectorBlocks(self, lines, nblock, ncols, dtype, phase):
+        blockRows, rowSets, counts, pending = [], [], [], []
+        for batch in self.lineBatches( lines, phase ):
+            batch = pending + batch
+            i, rows = 0, []
+            while i < len( batch ):
+                header = batch[i].split()
+                if len( header ) != nblock:
+                    raise Exception( "Expected a '" + str(nblock) + " column timestep " \
+                                     "line in " + self.fileName + ", got: " + batch[i] )
+                n = int( header[1] )
+                if i + 1 + n > len( batch ):
+                    break
+                blockRows.append( batch[i] )
+                rows.extend( batch[i+1:i+1+n] )
+                counts.append( n )
+                i += 1 + n
+            pending = batch[i:]
+            if rows:
+                rowSets.append( self.decodeRows( rows, ncols, dtype ) )
+                phase.add( rows=len( rows ) )
+        if pending:
+            raise Exception( "Truncated last timestep in " + self.fileName )
+
+        blocks = self.decodeRows( blockRows, nblock, float ) if blockRows \
+                 else np.zeros( (0, nblock) )
+        counts = np.array( counts, dtype=np.int64 )
+        rows   = np.concatenate( rowSets ) if rowSets else np.zeros( (0, ncols), dtype=dtype )
+        size   = counts.max() if len( counts ) else 0
+        if np.all( counts == size ):
+            return blocks, rows.reshape( len( counts ), size, ncols )
+
+        values = np.empty( ( len( counts ), size, ncols ), dtype=dtype )
+        values.fill( np.nan )
+        offsets = np.concatenate( [ [0], np.cumsum( counts ) ] )
+        for k, n in enumerate( counts ):
+            values[ k, :n ] = rows[ offsets[k] : offsets[k+1] ]
+        return blocks, values
+
+#---------------------------------------------------------------------------------#
+#   XYZ Trajectory Frame Index                                                    #
+#     With a fixed number of atoms every frame is natoms + 2 lines, so the byte   #
+#     offsets of all frames come from one vectorized newline scan of the file     #
+#     (in blocks) and any frame is then read back without the others.             #
+#---------------------------------------------------------------------------------#
+class XYZIndex(FileIndex):
+    blockSize = 2**24
+
+    def __init__(self, fileName):
+        self.fileName = fileName
+        self.stamp    = self.fileStamp( fileName )
+        self.natoms, self.starts = self.build()
+
+    @property
+    def nframes( self ):
+        return len( self.starts ) - 1
+
+    def build( self ):
+        with openFile( self.fileName ) as f:
+            first = f.readline().split()
+        if not first:
+            return 0, np.zeros( 1, dtype=np.int64 )
+        try:
+            natoms = int( first[0] )
+        except ValueError:
+            raise Exception( self.fileName + " does not start with the number " \
+                             "of atoms of an XYZ frame." )
+        stride = natoms + 2
+
+        starts, lines, offset, last = [ np.zeros( 1, dtype=np.int64 ) ], 0, 0, '\n'
+        with openFile( self.fileName ) as f:
+            while True:
+                block = f.read( self.blockSize )
+                if not block: break
+                newlines = np.flatnonzero( np.frombuffer( block, dtype=np.uint8 ) == 10 )
+                numbers  = lines + 1 + np.arange( len(newlines) )
+                starts.append( offset + 1 + newlines[ numbers % stride == 0 ] )
+                lines  += len( newlines )
+                offset += len( block )
+                last    = block[-1]
+
+        starts  = np.concatenate( starts ).astype( np.int64 )
+        nframes = ( lines + ( last != '\n' ) ) // stride
+        if len( starts ) == nframes:            # no newline after the last frame
+            starts = np.append( starts, offset )
+        return natoms, starts[:nframes+1]
+
+    # frames: slice, list of frame numbers or a single frame number
+    def select( self, frames=None ):
+        selected = np.arange( self.nframes )
+        if frames is not None:
+            selected = np.atleast_1d( selected[frames] )
+        return selected
+
 #---------------------------------------------------------------------------------#
 #   XYZ Trajectory File Class                                                     #
+#     Frames are decoded in bulk (blocks of consecutive frames split into tokens  #
+#     and converted by NumPy in one call) into a (frames x atoms x 3) array of    #
+#     coordinates plus the (atoms) array of elements of the first frame read.     #
 #---------------------------------------------------------------------------------#
 class XYZ(FileType):
-    
+    header     = [ "element", "x", "y", "z" ]
+    blockLines = 2**18
+    index      = None
+
     @property
     def format(self): 
         descript = ("XYZ - Chemical File Format ")
         return descript
 
-    def data(self, xcol, ycol):
+    def frameIndex( self ):
+        if self.index is None or self.index.fileName != self.fileName \
+                              or not self.index.isCurrent( self.fileName ):
+            self.index = XYZIndex( self.fileName )
+        return self.index
+
+    # {frame : {column : values}} for the requested element / x / y / z
+    # columns, the coordinates being views into the trajectory array
+    def data(self, xcol=None, ycol=None, frames=None):
+        columns = OrderedDict()
+        for col in ( xcol, ycol ):
+            if col == allColumns:
+                col = OrderedDict( (key, float) for key in self.header[1:] )
+            if col:
+                columns.update( col )
+        if not set( columns ).issubset( set( self.header ) ):
+            raise Exception( "ERROR: One of the following column headers: " \
+                              + str(set(columns)) + " was NOT Found in "\
+                              + self.fileName + " XYZ file "\
+                              "header section. \n Header list: " + ' '.join(self.header) )
+
+        numeric = [ np.dtype( columns[key] ) for key in columns if key != "element" ]
+        dtype   = np.result_type( *numeric ) if numeric else np.dtype( float )
+        selected = self.frameIndex().select( frames )
+        elements, coordinates = self.readTrajectory( self.fileName, frames, dtype )
+
         data = dict()
-        with self.file_obj as f:
-            logfile = f.read()
-            match = re.search("(.*)\n", logfile )
-            natoms = str(match.group(1))
-            pattern =  r"" + re.escape(natoms) + "\D*(.*)"
-            pattern = re.compile( pattern, re.DOTALL)
-            match = re.findall(pattern, logfile )
-            for i, lines in enumerate(match):
-                data[i] = self.getDataXYZ( lines, xcol, ycol )
-        return data
- 
-    def getDataXYZ( self, logData, xcol, ycol):
-        logData = logData.split("\n")
-        header  = ["element", "x", "y", "z"] 
-        rows    = logData[0:] 
-        data    = self.getData( header, rows, xcol, ycol )
+        for i, frame in enumerate( selected.tolist() ):
+            data[frame] = OrderedDict()
+            for key in columns:
+                if key == "element":
+                    data[frame][key] = elements
+                else:
+                    data[frame][key] = coordinates[ i, :, self.header.index(key) - 1 ]
         return data
 
+    def readTrajectory(self, fileName, frames=None, dtype=float):
+        self.fileName = fileName
+        index    = self.frameIndex()
+        selected = index.select( frames )
+        natoms   = index.natoms
+        coordinates = np.empty( ( len(selected), natoms, 3 ), dtype=dtype )
+        elements    = np.zeros( natoms, dtype=str )
+        if not len( selected ) or not natoms:
+            return elements, coordinates
+
+        # runs of consecutive frames of at most blockLines lines
+        perBlock = max( 1, self.blockLines // ( natoms + 2 ) )
+        runs, run = [], [ 0 ]
+        for i in range( 1, len(selected) ):
+            if selected[i] == selected[i-1] + 1 and len(run) < perBlock:
+                run.append( i )
+            else:
+                runs.append( run )
+                run = [ i ]
+        runs.append( run )
+
+        with profiling.getProfiler().phase( 'parse' ) as phase:
+            mm = index.open()
+            try:
+                for run in runs:
+                    first, last = selected[ run[0] ], selected[ run[-1] ]
+                    text = mm[ index.starts[first] : index.starts[last+1] ]
+                    frameElements, values = self.decodeFrames( text, len(run), natoms )
+                    coordinates[ run[0] : run[-1]+1 ] = values
+                    if run[0] == 0:                 # elements of the first frame read
+                        elements = frameElements
+                    phase.add( bytes=len(text), rows=len(run)*natoms )
+            finally:
+                mm.close()
+        return elements, coordinates
+
+    # Random access to frame k: (elements, (atoms x 3) coordinates)
+    def frame(self, fileName, k, dtype=float):
+        elements, coordinates = self.readTrajectory( fileName, [ k ], dtype )
+        return elements, coordinates[0]
+
+    def decodeFrames(self, text, nframes, natoms):
+        lines  = text.split( '\n' )
+        stride = natoms + 2
+        atomLines = []
+        for j in range( nframes ):
+            count = lines[ j*stride ].split()
+            if not count or count[0] != str( natoms ):
+                raise Exception( "Frame with " + ' '.join(count[:1]) + " atoms " \
+                                 "in " + self.fileName + ", XYZ frames must all " \
+                                 "have " + str(natoms) + " atoms." )
+            atomLines.extend( lines[ j*stride + 2 : (j+1)*stride ] )
+
+        tokens = ' '.join( atomLines ).split()
+        ncols  = len( tokens ) // ( nframes * natoms )
+        if ncols < 4 or len( tokens ) != ncols * nframes * natoms:
+            raise Exception( "Truncated or irregular atom lines in " + self.fileName )
+
+        xyz = [ None ] * ( 3 * nframes * natoms )
+        for j in range( 3 ):
+            xyz[j::3] = tokens[ j+1 :: ncols ]
+        with warnings.catch_warnings():
+            warnings.simplefilter( 'ignore' )
+            values = np.fromstring( ' '.join( xyz ), sep=' ' )
+        if values.size != len( xyz ):
+            raise Exception( "Non numeric coordinates in " + self.fileName )
+        elements = np.array( tokens[ 0 : ncols*natoms : ncols ] )
+        return elements, values.reshape( nframes, natoms, 3 )
+
 #---------------------------------------------------------------------------------#
 #   Chemical Potential Log File Class                                       #
 #---------------------------------------------------------------------------------#
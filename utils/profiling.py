@@ -0,0 +1,155 @@
+import os, sys, json
+import time
+import resource
+from collections import OrderedDict
+
+#---------------------------------------------------------------------------------#
+#   Per-phase profiling of a run                                                  #
+#---------------------------------------------------------------------------------#
+# Peak resident set size of the process in MB (ru_maxrss is in kB on Linux
+# and in bytes on OS X)
+def peakRSS():
+    peak = resource.getrusage( resource.RUSAGE_SELF ).ru_maxrss
+    return peak / 1024.**2 if sys.platform == 'darwin' else peak / 1024.
+
+def cpuTime():
+    times = os.times()
+    return times[0] + times[1]
+
+class Phase(object):
+    """ One timed phase (e.g. 'parse' of run chunk 2) of a Profiler,
+    used as a context manager. Counts of the bytes and rows it processed
+    are added with add() or by wrapping the rows with counted().
+    """
+    enabled = True
+
+    def __init__(self, profiler, name, chunk=None, bytes=0, rows=0):
+        self.profiler = profiler
+        self.record = OrderedDict( [ ("phase", name), ("chunk", chunk),
+                                     ("wall_s", None), ("cpu_s", None),
+                                     ("bytes", bytes), ("rows", rows),
+                                     ("peak_rss_mb", None) ] )
+
+    def add(self, bytes=0, rows=0):
+        self.record["bytes"] += bytes
+        self.record["rows"]  += rows
+
+    def counted(self, rows):
+        for row in rows:
+            self.record["bytes"] += len(row)
+            self.record["rows"]  += 1
+            yield row
+
+    def __enter__(self):
+        self.wall = time.time()
+        self.cpu  = cpuTime()
+        return self
+
+    def __exit__(self, *exc):
+        self.record["wall_s"] = time.time() - self.wall
+        self.record["cpu_s"]  = cpuTime() - self.cpu
+        self.record["peak_rss_mb"] = peakRSS()
+        self.profiler.finish( self.record )
+        return False
+
+class NullPhase(object):
+    """ Phase of the disabled profiler: nothing is timed or counted """
+    enabled = False
+
+    def add(self, bytes=0, rows=0):
+        pass
+
+    def counted(self, rows):
+        return rows
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+class NullProfiler(object):
+    """ Default profiler: every phase is the same no-op NullPhase so the
+    instrumented code costs one method call per phase when not profiling.
+    """
+    enabled = False
+    nullPhase = NullPhase()
+
+    def phase(self, name, chunk=None, bytes=0, rows=0):
+        return self.nullPhase
+
+class Profiler(NullProfiler):
+    """ Records wall time, CPU time, bytes, rows and the peak memory of the
+    process at the end of every phase. Hooks are called with every record
+    as its phase completes.
+
+    Usage:
+        >>> profiler = profiling.setProfiler( profiling.Profiler() )
+        >>> data = f.readData( 'log.lammps', None, { 'PotEng' : float } )
+        >>> profiler.printTable()
+    """
+    enabled = True
+
+    def __init__(self, hooks=None):
+        self.records = []
+        self.hooks   = list( hooks or [] )
+
+    def addHook(self, hook):
+        self.hooks.append( hook )
+
+    def phase(self, name, chunk=None, bytes=0, rows=0):
+        return Phase( self, name, chunk, bytes, rows )
+
+    def finish(self, record):
+        self.records.append( record )
+        for hook in self.hooks:
+            hook( record )
+
+    # Sum of the records of every phase name, in order of first appearance
+    def totals(self):
+        totals = OrderedDict()
+        for record in self.records:
+            total = totals.setdefault( record["phase"], OrderedDict( [
+                        ("phase", record["phase"]), ("chunk", "all"),
+                        ("wall_s", 0.0), ("cpu_s", 0.0), ("bytes", 0),
+                        ("rows", 0), ("peak_rss_mb", 0.0) ] ) )
+            for key in ("wall_s", "cpu_s", "bytes", "rows"):
+                total[key] += record[key]
+            total["peak_rss_mb"] = max( total["peak_rss_mb"], record["peak_rss_mb"] )
+        return list( totals.values() )
+
+    def printTable(self, stream=None):
+        stream = stream or sys.stderr
+        stream.write( "{0: <14} {1: >5} {2: >9} {3: >9} {4: >10} {5: >10} {6: >9} {7: >12}\n".format(
+                      "PHASE", "CHUNK", "WALL (s)", "CPU (s)", "MB", "ROWS",
+                      "MB/s", "PEAK RSS MB") )
+        stream.write( "-" * 85 + "\n" )
+        for records in ( self.records, self.totals() ):
+            for record in records:
+                chunk = "" if record["chunk"] is None else record["chunk"]
+                mb    = record["bytes"] / 1024.**2
+                rate  = mb / record["wall_s"] if record["wall_s"] > 0 else 0.0
+                stream.write( "{0: <14} {1: >5} {2: >9.4f} {3: >9.4f} {4: >10.2f} "
+                              "{5: >10} {6: >9.1f} {7: >12.1f}\n".format(
+                              record["phase"], chunk, record["wall_s"],
+                              record["cpu_s"], mb, record["rows"], rate,
+                              record["peak_rss_mb"]) )
+            stream.write( "-" * 85 + "\n" )
+
+    def writeJSONLines(self, stream=None):
+        stream = stream or sys.stderr
+        for record in self.records:
+            stream.write( json.dumps( record ) + "\n" )
+
+#---------------------------------------------------------------------------------#
+#   Process wide profiler used by the readers, the cache and the CLI              #
+#---------------------------------------------------------------------------------#
+profiler = NullProfiler()
+
+def getProfiler():
+    return profiler
+
+def setProfiler(newProfiler=None):
+    global profiler
+    profiler = newProfiler if newProfiler is not None else NullProfiler()
+    return profiler
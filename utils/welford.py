@@ -1,4 +1,5 @@
 import math
+import numpy as np
 class Welford(object):
     """ Implements Welford's algorithm for computing a running mean
     and standard deviation as described at: 
@@ -6,6 +7,11 @@ class Welford(object):
 
     can take single values or iterables
 
+    NumPy arrays are taken in bulk along their first axis (a 2-D array
+    of samples x columns accumulates every column at once) and partial
+    accumulators are merged exactly with combine() or + using the
+    parallel formula of Chan, Golub & LeVeque (1979)
+
     Properties:
         mean    - returns the mean
         std     - returns the std
@@ -25,6 +31,11 @@ class Welford(object):
         16.44374171455467
         >>> foo.meanfull
         (5.409090909090906, 0.4957974674244838)
+        >>> bar = Welford( np.arange(100.) ) + Welford( np.ones(1000) )
+        >>> bar
+        <Welford: 5.40909090909 +- 16.4437417146>
+        >>> Welford( np.arange(10.).reshape(5,2) ).mean
+        array([4., 5.])
     """
 
     def __init__(self,lst=None):
@@ -46,9 +57,47 @@ class Welford(object):
         lst = iter(lst)
         for x in lst:
             self.update(x)
+
+    # Two-pass statistics of the batch, then merged into the running ones
+    def updateBatch(self,x):
+        x = np.asarray(x, dtype=float)
+        if len(x) == 0:
+            return
+        mean = x.mean(axis=0)
+        dev  = x - mean
+        self.merge(len(x), mean, (dev*dev).sum(axis=0))
+
+    def merge(self,k,M,S):
+        if k == 0:
+            return
+        if self.k == 0:
+            self.k, self.M, self.S = k, M, S
+            return
+        n     = self.k + k
+        delta = M - self.M
+        self.M = self.M + delta*k*1./n
+        self.S = self.S + S + delta*delta*self.k*k*1./n
+        self.k = n
+
+    def combine(self,other):
+        new = Welford()
+        new.merge(self.k, self.M, self.S)
+        new.merge(other.k, other.M, other.S)
+        return new
+
+    def __add__(self,other):
+        return self.combine(other)
+
+    def __iadd__(self,other):
+        self.merge(other.k, other.M, other.S)
+        return self
     
     def __call__(self,x):
-        if hasattr(x,"__iter__"):
+        if isinstance(x, np.ndarray) and x.ndim > 0:
+            self.updateBatch(x)
+        elif isinstance(x, np.ndarray):
+            self.update(x[()])
+        elif hasattr(x,"__iter__"):
             self.consume(x)
         else:
             self.update(x)
@@ -62,7 +111,9 @@ class Welford(object):
     @property
     def std(self):
         if self.k==1:
-            return 0
+            return 0 if np.ndim(self.S) == 0 else np.zeros_like(self.S)
+        if np.ndim(self.S) > 0:
+            return np.sqrt(self.S/(self.k-1))
         return math.sqrt(self.S/(self.k-1))
     def __repr__(self):
         return "<Welford: {} +- {}>".format(self.mean, self.std)